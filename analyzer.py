@@ -0,0 +1,80 @@
+import hashlib
+import string
+from collections import Counter
+from stemming.porter2_fast import stem          #stems exactly like stemming.porter2, only faster
+from stemming.cache import CachingStemmer
+
+#shared by all analyzers without a stemmer of their own; every process gets its own copy
+default_stemmer = CachingStemmer(stem)
+
+
+class Analyzer:
+    """Turns text into the terms that are indexed and queried.
+
+    Digits are removed, punctuation separates tokens like whitespace does,
+    and tokens are lowercased and stemmed.  Stems shorter than min_length
+    characters or in the stopword list are dropped.  Document and query
+    parsing share one Analyzer so they always produce the same terms."""
+
+    def __init__(self, stop_words, stemmer=None, min_length=3):
+        """Constructor.
+
+        Takes the stopwords, a stemmer with a stem method (the cached Porter2
+        stemmer of this module if none is given), and the shortest stem that
+        is kept.  The translation table and stopword set are built once here."""
+        self.stop_words = frozenset(stop_words)
+        self.stemmer = stemmer
+        self.min_length = min_length
+        table = {character: None for character in string.digits}
+        table.update({character: ' ' for character in string.punctuation})
+        self.table = str.maketrans(table)
+
+    def get_stemmer(self):
+        """Get the stemmer the terms are stemmed with."""
+        return self.stemmer if self.stemmer is not None else default_stemmer
+
+    def get_fingerprint(self):
+        """Get a hex digest that changes whenever the analyzer would produce other terms.
+
+        Covers the stopwords, the shortest kept stem, the stem function and
+        the tokenizer table."""
+        stemmer = self.get_stemmer()
+        stem_function = getattr(stemmer, 'stem_function', stemmer)
+        stem_name = '%s.%s' % (getattr(stem_function, '__module__', ''),
+                               getattr(stem_function, '__qualname__', type(stem_function).__name__))
+        digest = hashlib.sha1()
+        for part in ('\n'.join(sorted(self.stop_words)), str(self.min_length), stem_name, repr(sorted(self.table.items()))):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def tokenize(self, text):
+        """Split text into lowercased tokens, before stemming and filtering."""
+        #str.split measured several times faster than a compiled \S+ pattern
+        return text.translate(self.table).lower().split()
+
+    def analyze(self, text):
+        """Analyze a block of text.
+
+        Returns a (term:frequency dictionary, number of tokens) tuple.  Terms
+        are in order of first occurrence; the number of tokens counts every
+        token, including those whose stems were dropped."""
+        tokens = self.tokenize(text)
+        token_counts = Counter(tokens)
+        stemmer = self.get_stemmer()
+        #every distinct token is stemmed once, in one batch if the stemmer can
+        if hasattr(stemmer, 'stem_many'):
+            stems = stemmer.stem_many(token_counts)
+        else:
+            stems = map(stemmer.stem, token_counts)
+        stop_words = self.stop_words
+        min_length = self.min_length
+        terms = {}
+        for term, count in zip(stems, token_counts.values()):
+            if len(term) >= min_length and term not in stop_words:
+                terms[term] = terms.get(term, 0) + count
+        return terms, len(tokens)
+
+    def get_term_counts(self, text):
+        """Get the term:frequency dictionary of a block of text."""
+        return self.analyze(text)[0]
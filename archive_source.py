@@ -0,0 +1,100 @@
+'''Reading collection folders straight out of zip and tar archives.
+
+An archive holds the same layout as a collection folder on disk: every
+top-level directory is a collection, and the .xml files directly inside it
+are its documents.  CorpusArchive streams the members in archive order, so
+nothing is extracted to disk and only the members being parsed are held
+in memory.'''
+import os
+import tarfile
+import zipfile
+from collections import namedtuple
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+#a zip member that worker processes open and decompress themselves
+ZipMember = namedtuple('ZipMember', ['archive_path', 'name'])
+
+#zip files opened by this process, by path
+open_zip_files = {}
+
+
+def is_archive(path):
+    '''Check whether a path names a zip or tar archive rather than a folder.'''
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def open_zip_member(member):
+    '''Open a ZipMember as a binary file, keeping its archive open for later members.'''
+    zip_file = open_zip_files.get(member.archive_path)
+    if zip_file is None:
+        zip_file = open_zip_files[member.archive_path] = zipfile.ZipFile(member.archive_path)
+    return zip_file.open(member.name)
+
+
+def split_member_name(name):
+    '''Get the (collection name, file name) of an archive member, or None if it is not a document.
+
+    Documents are .xml files directly inside a top-level directory; hidden
+    files are skipped like glob skips them.'''
+    #tar archives made with 'tar -C dir .' prefix every name with ./
+    parts = [part for part in name.split('/') if part not in ('', '.')]
+    if len(parts) != 2 or not parts[1].endswith('.xml') or parts[1].startswith('.'):
+        return None
+    return parts[0], parts[1]
+
+
+class CorpusArchive:
+    '''A zip or tar archive of collection folders.'''
+
+    def __init__(self, archive_path):
+        '''Constructor.
+
+        Takes the path of a zip archive or of a tar archive, compressed or
+        not.'''
+        self.archive_path = os.path.abspath(archive_path)
+        self.collection_names = []
+        self.positions = {}
+
+    def get_position(self, collection_name):
+        '''Get the position of a collection, adding it if it was not seen yet.
+
+        Collections are numbered in order of first appearance in the archive.'''
+        position = self.positions.get(collection_name)
+        if position is None:
+            position = self.positions[collection_name] = len(self.collection_names)
+            self.collection_names.append(collection_name)
+        return position
+
+    def get_collection_names(self):
+        '''Get the names of the collections seen so far, by position.'''
+        return self.collection_names
+
+    def iter_sources(self, decompress_in_workers=False):
+        '''Yield the documents of the archive as (collection id, source, size) tuples.
+
+        A source is what the document parsers of parse.py accept: the bytes
+        of the member, or, for zip archives with decompress_in_workers, a
+        ZipMember that the parsing process decompresses itself.  Tar
+        archives are read in a single sequential pass.'''
+        if zipfile.is_zipfile(self.archive_path):
+            with zipfile.ZipFile(self.archive_path) as zip_file:
+                for info in zip_file.infolist():
+                    names = split_member_name(info.filename)
+                    if info.is_dir() or names is None:
+                        continue
+                    position = self.get_position(names[0])
+                    if decompress_in_workers:
+                        yield position, ZipMember(self.archive_path, info.filename), info.file_size
+                    else:
+                        yield position, zip_file.read(info), info.file_size
+            return
+
+        #stream mode reads members in order without seeking back through the compressed data
+        with tarfile.open(self.archive_path, 'r|*') as tar_file:
+            for info in tar_file:
+                names = split_member_name(info.name)
+                if not info.isfile() or names is None:
+                    continue
+                position = self.get_position(names[0])
+                yield position, tar_file.extractfile(info).read(), info.size
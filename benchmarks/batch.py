@@ -0,0 +1,53 @@
+'''Compare scoring queries one at a time with BM25Scorer.score_batch.
+
+Run from the repository root:
+
+    python -m benchmarks.batch <coll-dir>
+
+Scores all queries of the50Queries.txt against every collection, as title
+queries and as long queries made of the title, description and narrative,
+once with BM25Scorer.score per query and once with score_batch over the
+whole query collection.  Prints the queries per second of both for the top
+15 and for the full ranking.  Fails if any ranking differs.'''
+import sys
+from bm25 import BM25Scorer
+from bow_query_coll import BowQueryColl
+from benchmarks.pruning import long_queries
+from benchmarks.timing import best_time
+from parse import get_stopwords, parse_documents, parse_query
+from ranking import TOP_K
+
+
+def main(inputpath):
+    stop_words = get_stopwords()
+    data_collection = parse_documents(stop_words, inputpath, compact=True)
+    queries = parse_query(stop_words, 'the50Queries.txt', data_collection.get_vocabulary())
+    long = BowQueryColl()
+    for query in long_queries(stop_words, queries).values():
+        long.add_query(query)
+    scorers = [BM25Scorer(data_collection.get_collection(i)) for i in range(data_collection.get_num_collections())]
+
+    failed = False
+    print(f'{"queries":<8}{"k":>6}{"terms":>8}{"single q/s":>12}{"batch q/s":>12}{"speedup":>9}')
+    for name, query_coll in (('title', queries), ('long', long)):
+        num_queries = query_coll.get_num_queries() * len(scorers)
+        num_terms = sum(len(scorers[0].get_query_terms(query)) for query in query_coll.get_queries().values())
+        for k in (TOP_K, None):
+            expected, single = best_time(lambda: [{queryid: scorer.score(query, k) for queryid, query in query_coll.get_queries().items()}
+                                                  for scorer in scorers])
+            got, batch = best_time(lambda: [scorer.score_batch(query_coll, k) for scorer in scorers])
+            if any(list(a) != list(b) or any(list(a[queryid].items()) != list(b[queryid].items()) for queryid in a)
+                   for a, b in zip(expected, got)):
+                print(f'{name} k={k}: batch rankings differ from single query scoring')
+                failed = True
+            print(f'{name:<8}{str(k):>6}{num_terms / query_coll.get_num_queries():>8.1f}'
+                  f'{num_queries / single:>12.1f}{num_queries / batch:>12.1f}{single / batch:>8.2f}x')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.stderr.write("USAGE: python -m benchmarks.batch <coll-dir>\n")
+        sys.exit()
+    main(sys.argv[1])
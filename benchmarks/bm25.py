@@ -0,0 +1,64 @@
+'''Compare the BM25 implementations of bm25.py: speed and agreement.
+
+Run from the repository root:
+
+    python -m benchmarks.bm25 <coll-dir>
+
+Parses the collection and scores every query of the50Queries.txt against
+every collection with my_bm25, my_bm25_vectorized and BM25Scorer, whose
+IDF and K arrays are built once per collection.  Prints the queries per
+second of each, the time to build the scorers, the largest score
+difference from my_bm25, and how many rankings differ from it.  Fails if
+BM25Scorer ranks any query differently.'''
+import sys
+import time
+from bm25 import BM25Scorer, my_bm25, my_bm25_vectorized
+from parse import get_stopwords, parse_documents, parse_query
+
+QUERY_IDS = range(101, 151)
+
+
+def run(rank, pairs):
+    '''Rank every (collection, query) pair and return (rankings, seconds).'''
+    start = time.perf_counter()
+    rankings = [rank(collection, query) for collection, query in pairs]
+    return rankings, time.perf_counter() - start
+
+
+def main(inputpath):
+    stop_words = get_stopwords()
+    data_collection = parse_documents(stop_words, inputpath, compact=True)
+    queries = parse_query(stop_words, 'the50Queries.txt', data_collection.get_vocabulary())
+    collections = [data_collection.get_collection(i) for i in range(data_collection.get_num_collections())]
+    pairs = [(collection, queries.get_query(query_id)) for collection in collections for query_id in QUERY_IDS]
+    for collection in collections:
+        collection.get_term_matrix()            #shared by the vectorized rankers, not part of their time
+
+    start = time.perf_counter()
+    scorers = {id(collection): BM25Scorer(collection) for collection in collections}
+    build_time = time.perf_counter() - start
+    results = {
+        'my_bm25': run(my_bm25, pairs),
+        'my_bm25_vectorized': run(my_bm25_vectorized, pairs),
+        'BM25Scorer': run(lambda collection, query: scorers[id(collection)].score(query), pairs),
+    }
+
+    baseline = results['my_bm25'][0]
+    print(f'{len(pairs)} queries over {len(collections)} collections, scorers built in {build_time:.3f}s')
+    print(f'{"ranker":<20}{"queries/s":>12}{"max diff":>12}{"differ":>8}')
+    for name, (rankings, elapsed) in results.items():
+        max_diff = max(abs(ranking[docid] - expected[docid]) for ranking, expected in zip(rankings, baseline)
+                       for docid in expected)
+        differ = sum(list(ranking) != list(expected) for ranking, expected in zip(rankings, baseline))
+        print(f'{name:<20}{len(pairs) / elapsed:>12.1f}{max_diff:>12.2e}{differ:>8}')
+    if any(list(ranking.items()) != list(expected.items())
+           for ranking, expected in zip(results['BM25Scorer'][0], baseline)):
+        print('BM25Scorer does not match my_bm25')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.stderr.write("USAGE: python -m benchmarks.bm25 <coll-dir>\n")
+        sys.exit()
+    main(sys.argv[1])
@@ -0,0 +1,93 @@
+'''Check the compiled Paice-Husk stemmer against the original and compare their speed.
+
+Run from the repository root:
+
+    python -m benchmarks.paicehusk [coll-dir]
+
+Builds a word list from synthetic words that combine random stems with the
+endings of the default Paice-Husk rules and the prefixes the stemmer strips,
+plus the tokens of the collection if one is given.  Fails if any word is
+stemmed differently by stemming.paicehusk.PaiceHuskStemmer and
+CompiledPaiceHuskStemmer, or raises a different error, or if a CachingStemmer
+of a stemmer with its own rules stems differently across worker processes,
+then prints the words per second of both.'''
+import random
+import sys
+from benchmarks.porter2 import LETTERS, VOWEL_HEAVY, collection_words, outcome, throughput
+from stemming.cache import CachingStemmer
+from stemming.paicehusk import PaiceHuskStemmer, CompiledPaiceHuskStemmer, defaultrules
+
+#a rule set unlike the default rules, only removing a final -s
+CUSTOM_RULES = "s1.  { -s > - }\n"
+
+
+def rule_endings(stemmer):
+    '''Get the endings of the rules of a Paice-Husk stemmer, and the texts they append.'''
+    endings = set()
+    for rulelist in stemmer.rules.values():
+        for ending, _, _, append, _ in rulelist:
+            endings.add(ending)
+            endings.add(append)
+    endings.discard('')
+    return sorted(endings)
+
+
+def synthetic_words(stemmer, count, seed=0):
+    '''Make count words from random stems followed by zero to three rule endings.'''
+    rng = random.Random(seed)
+    endings = rule_endings(stemmer)
+    words = list(endings) + [prefix + ending for prefix in stemmer.prefixes for ending in endings]
+    words += list(stemmer.prefixes) + [prefix[:-1] for prefix in stemmer.prefixes]
+    while len(words) < count:
+        alphabet = VOWEL_HEAVY if rng.random() < 0.5 else LETTERS
+        word = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 7)))
+        for _ in range(rng.randint(0, 3)):
+            word += rng.choice(endings)
+        if rng.random() < 0.1:
+            word = rng.choice(stemmer.prefixes) + word
+        words.append(word)
+    return words
+
+
+def worker_mismatches(words, workers=2):
+    '''Get the words a CachingStemmer of custom rules stems differently with worker processes.'''
+    custom = CompiledPaiceHuskStemmer(CUSTOM_RULES)
+    words = [word for word in words if not isinstance(outcome(custom.stem, word), type)]
+    stems = CachingStemmer(custom.stem).stem_many(words, workers)
+    return [(word, custom.stem(word), stemmed) for word, stemmed in zip(words, stems) if custom.stem(word) != stemmed]
+
+
+def main(inputpath=None):
+    original = PaiceHuskStemmer(defaultrules)
+    compiled = CompiledPaiceHuskStemmer(defaultrules)
+    words = synthetic_words(original, 200000)
+    if inputpath is not None:
+        words += collection_words(inputpath)
+    #words the original cannot stem must fail the same way
+    mismatches = [(word, outcome(original.stem, word), outcome(compiled.stem, word)) for word in words]
+    mismatches = [mismatch for mismatch in mismatches if mismatch[1] != mismatch[2]]
+    for word, expected, got in mismatches[:20]:
+        print(f'MISMATCH {word!r}: original {expected!r}, compiled {got!r}')
+    print(f'{len(words)} words, {len(mismatches)} mismatches')
+    if mismatches:
+        sys.exit(1)
+    mismatches = worker_mismatches(words)
+    for word, expected, got in mismatches[:20]:
+        print(f'MISMATCH {word!r}: custom rules {expected!r}, worker processes {got!r}')
+    if mismatches:
+        print(f'{len(mismatches)} words stemmed differently by worker processes')
+        sys.exit(1)
+
+    print(f'{"stemmer":<14}{"words/s":>12}')
+    slow = throughput(original.stem, words)
+    fast = throughput(compiled.stem, words)
+    print(f'{"original":<14}{slow:>12.0f}')
+    print(f'{"compiled":<14}{fast:>12.0f}')
+    print(f'speedup: {fast / slow:.2f}x')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        sys.stderr.write("USAGE: python -m benchmarks.paicehusk [coll-dir]\n")
+        sys.exit()
+    main(sys.argv[1] if len(sys.argv) == 2 else None)
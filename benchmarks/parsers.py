@@ -0,0 +1,45 @@
+'''Compare the document parser backends of parse.py.
+
+Run from the repository root:
+
+    python -m benchmarks.parsers <coll-dir>
+
+Parses every XML file of the collection with each backend in PARSERS, using
+the same analyzer, and prints files per second and how many documents the
+backends disagree on.'''
+import sys
+from analyzer import Analyzer
+from benchmarks.timing import best_time
+from parse import PARSERS, get_stopwords, list_collection_files
+
+
+def time_parser(parse_file, stop_words, file_paths, analyzer, repeats=3):
+    '''Parse all files with a backend and return (documents, best seconds).'''
+    return best_time(lambda: [parse_file(stop_words, file_path, analyzer=analyzer) for file_path in file_paths], repeats)
+
+
+def main(inputpath):
+    stop_words = get_stopwords()
+    file_paths = [file_path for _, folder_files in list_collection_files(inputpath) for file_path in folder_files]
+    analyzer = Analyzer(stop_words)
+    #stem every word once up front, so no backend pays for a cold stem cache
+    for file_path in file_paths:
+        PARSERS['lines'](stop_words, file_path, analyzer=analyzer)
+
+    results = {name: time_parser(parse_file, stop_words, file_paths, analyzer) for name, parse_file in PARSERS.items()}
+    print(f'{len(file_paths)} files')
+    print(f'{"parser":<8}{"seconds":>10}{"files/s":>12}')
+    for name, (_, elapsed) in results.items():
+        print(f'{name:<8}{elapsed:>10.3f}{len(file_paths) / elapsed:>12.0f}')
+    baseline = results['lines'][0]
+    for name, (documents, _) in results.items():
+        differ = sum((a.get_docid(), a.get_doc_len(), a.get_term_freq_dict()) != (b.get_docid(), b.get_doc_len(), b.get_term_freq_dict())
+                     for a, b in zip(baseline, documents))
+        print(f'{name}: {differ} documents differ from the line parser')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.stderr.write("USAGE: python -m benchmarks.parsers <coll-dir>\n")
+        sys.exit()
+    main(sys.argv[1])
@@ -0,0 +1,105 @@
+'''Check stemming.porter2_fast against stemming.porter2 and compare their speed.
+
+Run from the repository root:
+
+    python -m benchmarks.porter2 [coll-dir]
+
+Builds a word list from synthetic words that combine random stems with every
+suffix the Porter2 rules know, plus the tokens of the collection if one is
+given.  Fails if any word is stemmed differently, or raises a different
+error, then prints the words per second of both implementations.'''
+import random
+import sys
+from analyzer import Analyzer
+from benchmarks.timing import best_time
+from parse import list_collection_files
+from stemming import porter2, porter2_fast
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+VOWEL_HEAVY = 'aeiouyaeiouybcdlmnrstvwxz'
+
+
+def rule_suffixes():
+    '''Get every suffix the Porter2 rules of stemming.porter2 test for.'''
+    suffixes = {end for end, _, _ in porter2.s2_triples}
+    suffixes.update(end for end, _, _ in porter2.s3_triples)
+    suffixes.update(porter2.s4_delete_list)
+    suffixes.update(porter2.s1b_suffixes)
+    suffixes.update(porter2.doubles)
+    suffixes.update(('eedly', 'eed', 'sses', 'ied', 'ies', 'us', 'ss', 's', 'sion', 'tion', 'e', 'l', 'll', 'y', 'Y',
+                     "'s'", "'s", "'", 'at', 'bl', 'iz', 'ogi', 'li'))
+    return sorted(suffixes)
+
+
+def synthetic_words(count, seed=0):
+    '''Make count words from random stems followed by zero to three rule suffixes.'''
+    rng = random.Random(seed)
+    suffixes = rule_suffixes()
+    words = list(porter2.exceptional_forms) + list(porter2.exceptional_early_exit_post_1a)
+    words += ['gener' + suffix for suffix in suffixes] + ['arsen' + suffix for suffix in suffixes]
+    words += ['commun' + suffix for suffix in suffixes]
+    while len(words) < count:
+        alphabet = VOWEL_HEAVY if rng.random() < 0.5 else LETTERS
+        word = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 7)))
+        for _ in range(rng.randint(0, 3)):
+            word += rng.choice(suffixes)
+        prefix = rng.random()
+        if prefix < 0.05:
+            word = "'" + word
+        elif prefix < 0.15:
+            word = 'y' + word
+        words.append(word.replace('Y', 'y'))
+    return words
+
+
+def collection_words(inputpath):
+    '''Get the distinct lowercased tokens of the documents of a collection folder.'''
+    analyzer = Analyzer([])
+    words = {}
+    for _, file_paths in list_collection_files(inputpath):
+        for file_path in file_paths:
+            with open(file_path, encoding='utf-8') as file:
+                words.update(dict.fromkeys(analyzer.tokenize(file.read())))
+    return list(words)
+
+
+def outcome(stem, word):
+    '''Get the stem of a word, or the type of the error stemming it raises.'''
+    try:
+        return stem(word)
+    except Exception as error:
+        return type(error)
+
+
+def throughput(stem, words, repeats=3):
+    '''Get the best words per second of a stem function over a word list.'''
+    _, best = best_time(lambda: [outcome(stem, word) for word in words], repeats)
+    return len(words) / best
+
+
+def main(inputpath=None):
+    words = synthetic_words(200000)
+    if inputpath is not None:
+        words += collection_words(inputpath)
+    #words the original cannot stem must fail the same way
+    mismatches = [(word, outcome(porter2.stem, word), outcome(porter2_fast.stem, word)) for word in words]
+    mismatches = [mismatch for mismatch in mismatches if mismatch[1] != mismatch[2]]
+    for word, expected, got in mismatches[:20]:
+        print(f'MISMATCH {word!r}: porter2 {expected!r}, porter2_fast {got!r}')
+    print(f'{len(words)} words, {len(mismatches)} mismatches')
+    if mismatches:
+        sys.exit(1)
+
+    print(f'{"stemmer":<14}{"words/s":>12}')
+    slow = throughput(porter2.stem, words)
+    fast = throughput(porter2_fast.stem, words)
+    print(f'{"porter2":<14}{slow:>12.0f}')
+    print(f'{"porter2_fast":<14}{fast:>12.0f}')
+    print(f'speedup: {fast / slow:.2f}x')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        sys.stderr.write("USAGE: python -m benchmarks.porter2 [coll-dir]\n")
+        sys.exit()
+    main(sys.argv[1] if len(sys.argv) == 2 else None)
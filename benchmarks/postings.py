@@ -0,0 +1,87 @@
+'''Compare plain and bit-packed postings: index size and BM25 query latency.
+
+Run from the repository root:
+
+    python -m benchmarks.postings <coll-dir>
+
+Parses the collection once, writes it as an index with plain postings and
+as one with block-compressed postings, and ranks every query of
+the50Queries.txt against its collection on lazily opened views of each
+index: with my_bm25, which reads the postings, and with the BM25Scorer
+top k that main.py ranks with, which reads the term matrix built from the
+forward index.'''
+import os
+import sys
+import tempfile
+from bm25 import BM25Scorer, my_bm25
+from benchmarks.timing import best_time
+from index_reader import open_index
+from index_store import IndexFile, write_index
+from parse import get_stopwords, parse_documents, parse_query
+from ranking import TOP_K
+
+POSTINGS_ARRAYS = ('post_rows', 'post_tfs', 'post_data', 'block_ptr', 'row_widths', 'tf_widths', 'term_block_ptr')
+
+
+def postings_bytes(index_path):
+    '''Get the number of bytes the postings of an index file take.'''
+    index_file = IndexFile(index_path)
+    total = 0
+    for i in range(index_file.get_num_collections()):
+        for name, values in index_file.get_collection_arrays(i).items():
+            if name in POSTINGS_ARRAYS:
+                total += values.nbytes
+    return total
+
+
+def rank_postings(collection, query):
+    return my_bm25(collection, query)
+
+
+def rank_scorer(collection, query):
+    return BM25Scorer(collection).score(query, TOP_K)
+
+
+def time_queries(index_path, query_file, stop_words, rank, repeats=3):
+    '''Rank every query against its collection and return (rankings, seconds per query).'''
+    data_collection = open_index(index_path)
+    queries = parse_query(stop_words, query_file, data_collection.get_vocabulary())
+    #a fresh view per repeat, so no postings are cached between runs
+    views = [open_index(index_path) for _ in range(repeats)]
+
+    def rank_all():
+        view = views.pop()
+        return [rank(view.get_collection(i), queries.get_query(101 + i)) for i in range(view.get_num_collections())]
+
+    rankings, best = best_time(rank_all, repeats)
+    return rankings, best / data_collection.get_num_collections()
+
+
+def main(inputpath):
+    stop_words = get_stopwords()
+    query_file = os.path.abspath('the50Queries.txt')
+    data_collection = parse_documents(stop_words, inputpath, compact=True)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for compression in (None, 'bitpack'):
+            index_path = os.path.join(tmp, f'{compression or "plain"}.idx')
+            write_index(data_collection, index_path, compression)
+            rankings, latency = time_queries(index_path, query_file, stop_words, rank_postings)
+            scorer_rankings, scorer_latency = time_queries(index_path, query_file, stop_words, rank_scorer)
+            results[compression or 'plain'] = (os.path.getsize(index_path), postings_bytes(index_path), latency,
+                                               scorer_latency, rankings, scorer_rankings)
+
+    print(f'{"postings":<10}{"file bytes":>14}{"postings bytes":>16}{"my_bm25 ms":>12}{"scorer ms":>11}')
+    for name, (file_size, post_size, latency, scorer_latency, _, _) in results.items():
+        print(f'{name:<10}{file_size:>14}{post_size:>16}{latency * 1000:>12.2f}{scorer_latency * 1000:>11.2f}')
+    plain, packed = results['plain'], results['bitpack']
+    print(f'postings size ratio: {packed[1] / plain[1]:.3f}')
+    print('identical rankings:', plain[4] == packed[4] and plain[5] == packed[5])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.stderr.write("USAGE: python -m benchmarks.postings <coll-dir>\n")
+        sys.exit()
+    main(sys.argv[1])
@@ -0,0 +1,69 @@
+'''Compare exhaustive BM25 with MaxScore pruning: postings read and latency.
+
+Run from the repository root:
+
+    python -m benchmarks.pruning <coll-dir> [k ...]
+
+Ranks every collection for its topic of the50Queries.txt, once with the
+title query and once with a long query made of the title, description and
+narrative.  For each k (15 and 100 by default) it times my_bm25, which
+scores every posting of the query terms, against bm25_max_score, and
+prints the share of postings MaxScore did not read and the speedup.  A
+search of a non-essential term's postings counts as one posting read.
+Fails if any top k differs.'''
+import sys
+from analyzer import Analyzer
+from bm25 import bm25_max_score, max_score_rows, my_bm25
+from benchmarks.timing import best_time
+from bow_query import BowQuery
+from parse import get_stopwords, parse_documents, parse_query
+
+
+def long_queries(stop_words, queries):
+    '''Make a query of the title, description and narrative of every topic.'''
+    analyzer = Analyzer(stop_words)
+    long = {}
+    for query_id, query in queries.get_queries().items():
+        text = ' '.join((query.get_query_title(), query.get_query_desc(), query.get_query_narr()))
+        long[query_id] = BowQuery(query_id)
+        long[query_id].add_term_counts(analyzer.get_term_counts(text))
+    return long
+
+
+def main(inputpath, ks):
+    stop_words = get_stopwords()
+    data_collection = parse_documents(stop_words, inputpath, compact=True)
+    queries = parse_query(stop_words, 'the50Queries.txt', data_collection.get_vocabulary())
+    query_sets = {'title': queries.get_queries(), 'long': long_queries(stop_words, queries)}
+    collections = [data_collection.get_collection(i) for i in range(data_collection.get_num_collections())]
+    #topic 101 + i ranks collection i
+    pairs = {name: [(collection, query_set[101 + i]) for i, collection in enumerate(collections) if 101 + i in query_set]
+             for name, query_set in query_sets.items()}
+
+    failed = False
+    print(f'{"queries":<8}{"k":>6}{"terms":>8}{"postings":>10}{"skipped":>9}{"exhaustive ms":>15}{"maxscore ms":>13}{"speedup":>9}')
+    for name, query_pairs in pairs.items():
+        term_ids = [(collection, query.get_term_ids(collection.get_vocabulary())) for collection, query in query_pairs]
+        num_terms = sum(len(ids) for _, ids in term_ids) / len(query_pairs)
+        total_postings = sum(len(collection.get_inverted_index().get_postings_by_id(term_id))
+                             for collection, ids in term_ids for term_id in ids)
+        for k in ks:
+            expected, exhaustive = best_time(lambda: [my_bm25(collection, query, k=k) for collection, query in query_pairs])
+            got, pruned = best_time(lambda: [bm25_max_score(collection, query, k) for collection, query in query_pairs])
+            read = sum(max_score_rows(collection, query, k)[1] for collection, query in query_pairs)
+            if any(list(a.items()) != list(b.items()) for a, b in zip(expected, got)):
+                print(f'{name} k={k}: MaxScore top k differs from exhaustive scoring')
+                failed = True
+            skipped = 1 - read / total_postings if total_postings else 0.0
+            print(f'{name:<8}{k:>6}{num_terms:>8.1f}{total_postings:>10}{skipped:>9.1%}'
+                  f'{1000 * exhaustive / len(query_pairs):>15.3f}{1000 * pruned / len(query_pairs):>13.3f}'
+                  f'{exhaustive / pruned:>8.2f}x')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write("USAGE: python -m benchmarks.pruning <coll-dir> [k ...]\n")
+        sys.exit()
+    main(sys.argv[1], [int(k) for k in sys.argv[2:]] or [15, 100])
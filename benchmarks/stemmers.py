@@ -0,0 +1,143 @@
+'''Compare the stemmers of the stemming package on speed, memory, conflation and retrieval.
+
+Run from the repository root:
+
+    python -m benchmarks.stemmers <coll-dir> <report.json> [judgements-dir]
+
+For every stemmer in stemming.cache.STEMMERS, over the tokens of the
+collection's Data_C* documents, measures:
+
+- words per second stemming every distinct token once (cold), and stemming
+  the full token stream through a CachingStemmer that has seen it (cached);
+- the peak traced memory of a cold CachingStemmer pass over the stream;
+- the vocabulary reduction, one minus distinct stems over distinct tokens;
+- the BM25 MAP over queries R101 onwards, ranking each collection for its
+  query with bm25.my_bm25 and scoring the top 15 like perform_bm25 writes
+  them, with evaluate.calculate_ap against the judgements if given.
+
+Words a stemmer raises an error on, such as Paice-Husk on words without
+vowels, are counted and kept unstemmed.  The report is written as JSON and
+printed as a table.'''
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from analyzer import Analyzer
+from benchmarks.timing import best_time
+from bm25 import my_bm25
+from evaluate import calculate_ap, load_relevance_judgements
+from parse import get_stopwords, list_collection_files, parse_documents, parse_query
+from ranking import TOP_K
+from stemming.cache import STEMMERS, CachingStemmer, get_stem_function
+
+QUERY_FILE = 'the50Queries.txt'
+FIRST_QUERY = 101
+
+
+class FallbackStemmer:
+    '''Stems with a stem function, keeping the words it raises an error on unstemmed.'''
+
+    def __init__(self, stem_function):
+        self.stem_function = stem_function
+        self.failures = set()
+
+    def stem(self, word):
+        try:
+            return self.stem_function(word)
+        except Exception:
+            self.failures.add(word)
+            return word
+
+
+def collection_tokens(inputpath):
+    '''Get every lowercased token of the documents of a collection folder, in order.'''
+    analyzer = Analyzer([])
+    tokens = []
+    for _, file_paths in list_collection_files(inputpath):
+        for file_path in file_paths:
+            with open(file_path, encoding='utf-8') as file:
+                tokens += analyzer.tokenize(file.read())
+    return tokens
+
+
+def stream(stemmer, tokens):
+    for token in tokens:
+        stemmer.stem(token)
+
+
+def cold_peak(stem, tokens):
+    '''Get the peak traced bytes of stemming a token stream with a new CachingStemmer.'''
+    tracemalloc.start()
+    stream(CachingStemmer(stem), tokens)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bm25_map(stop_words, inputpath, stemmer, judgements):
+    '''Get the BM25 MAP of the collection parsed with a stemmer, or None without judgements.'''
+    if judgements is None:
+        return None
+    data_collection = parse_documents(stop_words, inputpath, compact=True, stemmer=stemmer)
+    queries = parse_query(stop_words, QUERY_FILE, data_collection.get_vocabulary(), stemmer)
+    average_precisions = []
+    for position in range(data_collection.get_num_collections()):
+        query_id = FIRST_QUERY + position
+        if f'R{query_id}' not in judgements:
+            continue
+        rankings = my_bm25(data_collection.get_collection(position), queries.get_query(query_id), k=TOP_K)
+        ranked_list = [str(docid) for docid in rankings]
+        average_precisions.append(float(calculate_ap(ranked_list, judgements[f'R{query_id}'])))
+    return sum(average_precisions) / len(average_precisions) if average_precisions else None
+
+
+def measure(name, tokens, vocabulary, stop_words, inputpath, judgements):
+    '''Measure one stemmer and return its report entry.'''
+    stemmer = FallbackStemmer(get_stem_function(name))
+    stem = stemmer.stem
+    _, cold = best_time(lambda: [stem(word) for word in vocabulary])
+    cached_stemmer = CachingStemmer(stem, max_size=len(vocabulary) + 1)
+    stream(cached_stemmer, tokens)
+    _, cached = best_time(lambda: stream(cached_stemmer, tokens))
+    stems = {stem(word) for word in vocabulary}
+    return {
+        'cold_words_per_second': len(vocabulary) / cold,
+        'cached_words_per_second': len(tokens) / cached,
+        'peak_memory_bytes': cold_peak(stem, tokens),
+        'distinct_stems': len(stems),
+        'vocabulary_reduction': 1 - len(stems) / len(vocabulary) if vocabulary else 0.0,
+        'failures': len(stemmer.failures),
+        'bm25_map': bm25_map(stop_words, inputpath, CachingStemmer(stem), judgements),
+    }
+
+
+def main(inputpath, report_path, judgements_path=None):
+    stop_words = get_stopwords()
+    tokens = collection_tokens(inputpath)
+    vocabulary = list(dict.fromkeys(tokens))
+    judgements = load_relevance_judgements(judgements_path) if judgements_path is not None else None
+    report = {
+        'collection': os.path.abspath(inputpath),
+        'python': platform.python_version(),
+        'tokens': len(tokens),
+        'distinct_tokens': len(vocabulary),
+        'stemmers': {name: measure(name, tokens, vocabulary, stop_words, inputpath, judgements) for name in STEMMERS},
+    }
+    with open(report_path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f'{len(tokens)} tokens, {len(vocabulary)} distinct')
+    print(f'{"stemmer":<14}{"cold w/s":>12}{"cached w/s":>12}{"peak MiB":>10}{"reduction":>11}{"failures":>10}{"MAP":>8}')
+    for name, entry in report['stemmers'].items():
+        bm25 = 'n/a' if entry['bm25_map'] is None else f'{entry["bm25_map"]:.4f}'
+        print(f'{name:<14}{entry["cold_words_per_second"]:>12.0f}{entry["cached_words_per_second"]:>12.0f}'
+              f'{entry["peak_memory_bytes"] / 2**20:>10.2f}{entry["vocabulary_reduction"]:>11.1%}'
+              f'{entry["failures"]:>10}{bm25:>8}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        sys.stderr.write("USAGE: python -m benchmarks.stemmers <coll-dir> <report.json> [judgements-dir]\n")
+        sys.exit()
+    main(*sys.argv[1:])
@@ -0,0 +1,53 @@
+'''Compare the peak memory of parse_documents and the streaming parser.
+
+Run from the repository root:
+
+    python -m benchmarks.streaming <coll-dir> [workers]
+
+Parses the collection twice while tracing allocations: once into a
+DataCollection with parse_documents, and once with iter_documents,
+keeping only per-collection document and term counts.  The streaming peak
+should not grow with the size of the collection.'''
+import sys
+import time
+import tracemalloc
+from parse import get_stopwords, iter_documents, parse_documents
+
+
+def traced(function):
+    '''Call a function and return (result, seconds, peak traced bytes).'''
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def stream_counts(stop_words, inputpath, workers):
+    '''Count the documents and term occurrences of every collection from the stream.'''
+    counts = {}
+    for position, document in iter_documents(stop_words, inputpath, workers=workers):
+        num_docs, num_terms = counts.get(position, (0, 0))
+        counts[position] = (num_docs + 1, num_terms + document.get_doc_len())
+    return counts
+
+
+def main(inputpath, workers):
+    stop_words = get_stopwords()
+    data_collection, full_time, full_peak = traced(lambda: parse_documents(stop_words, inputpath, workers=workers))
+    counts, stream_time, stream_peak = traced(lambda: stream_counts(stop_words, inputpath, workers))
+
+    num_docs = sum(num_docs for num_docs, _ in counts.values())
+    print(f'{num_docs} documents in {data_collection.get_num_collections()} collections')
+    print(f'{"parser":<16}{"seconds":>10}{"peak MiB":>12}')
+    print(f'{"parse_documents":<16}{full_time:>10.2f}{full_peak / 2**20:>12.2f}')
+    print(f'{"iter_documents":<16}{stream_time:>10.2f}{stream_peak / 2**20:>12.2f}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        sys.stderr.write("USAGE: python -m benchmarks.streaming <coll-dir> [workers]\n")
+        sys.exit()
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else 1)
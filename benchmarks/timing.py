@@ -0,0 +1,14 @@
+'''Timing helper shared by the benchmarks.'''
+import time
+
+
+def best_time(function, repeats=3):
+    '''Call a function a few times and return (its last result, the best seconds of a call).'''
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
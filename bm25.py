@@ -1,12 +1,18 @@
+import bisect
+import heapq
 import math
 import os
+import numpy as np
+from scipy.sparse import csc_matrix
 from file_handler import FileHandler, KeyValueFile
+from ranking import TOP_K, top_k, top_k_matrix_rows, top_k_rows
+
+#relative slack on upper bounds, far above the rounding error of a sum of BM25 contributions
+BOUND_MARGIN = 1e-9
 
 def get_avg_length(collection_of_documents):
     '''Get the average length of documents in the collection'''
-    #add up all doc lengths for documents in coll 
-    total_doc_length = sum(doc.doc_len for doc in collection_of_documents.get_docs().values()) 
-    return total_doc_length / collection_of_documents.get_num_docs() if collection_of_documents else 0
+    return collection_of_documents.get_statistics().get_avg_doc_len()
 
 
 def calculate_bm25(N, ni, fi, qfi, K, k1, k2):
@@ -15,27 +21,307 @@ def calculate_bm25(N, ni, fi, qfi, K, k1, k2):
     query_freq_component = ((k2 + 1) * qfi) / (k2 + qfi)
     return idf * term_freq_component * query_freq_component
 
-def my_bm25(collection_of_documents, query, k1=1.2, b=0.75, k2=500):
-    N = collection_of_documents.get_num_docs()
-    avg_length = get_avg_length(collection_of_documents)
-    R = 0
-    ri = 0
+def bm25_term_at_a_time(collection_of_documents, query, k1=1.2, b=0.75, k2=500):
+    '''Score the collection one query term at a time over its inverted index.
+
+    Only documents in the postings of a query term are visited, so documents
+    sharing no term with the query have no entry in the returned dictionary.'''
+    index = collection_of_documents.get_inverted_index()
+    statistics = collection_of_documents.get_statistics()
+    N = statistics.get_num_docs()
+    avg_length = statistics.get_avg_doc_len()
+
+    accumulators = {}
+    for term_id, frequency in query.get_term_ids(collection_of_documents.get_vocabulary()).items():
+        postings = index.get_postings_by_id(term_id)
+        ni = len(postings)
+        qfi = frequency
+        for key, fi in postings.items():
+            dl = statistics.get_doc_len(key)
+            K = k1 * ((1 - b) + b * (dl / float(avg_length)))
+            accumulators[key] = accumulators.get(key, 0) + calculate_bm25(N, ni, fi, qfi, K, k1, k2)
+    return accumulators
+
+def my_bm25(collection_of_documents, query, k1=1.2, b=0.75, k2=500, k=None):
+    '''Rank the documents of a collection for a query by BM25.
+
+    Returns the k highest scoring documents as a docid:score dictionary in
+    ranking order, or all of them with k=None.'''
+    accumulators = bm25_term_at_a_time(collection_of_documents, query, k1, b, k2)
 
+    #documents without any query term keep a score of 0
     bm25_doc_scores = {}
-    for key, document in collection_of_documents.get_docs().items():
-        dl = document.get_doc_len()
+    for key in collection_of_documents.get_docs().keys():
+        bm25_doc_scores[key] = accumulators.get(key, 0)
+
+    return top_k(bm25_doc_scores, k)
+
+def bm25_max_score(collection_of_documents, query, k=TOP_K, k1=1.2, b=0.75, k2=500):
+    '''Rank the k highest scoring documents by BM25 with MaxScore pruning.
+
+    Returns the same docid:score dictionary as my_bm25 with the same k.  See
+    max_score_rows for how postings are skipped.  With k=None every document
+    is ranked, so no posting can be skipped and this falls back to my_bm25.'''
+    if k is None:
+        return my_bm25(collection_of_documents, query, k1, b, k2)
+    if k <= 0:
+        return {}
+    ranked, _ = max_score_rows(collection_of_documents, query, k, k1, b, k2)
+    docids = collection_of_documents.get_term_matrix().get_docids()
+    rankings = dict(zip(docids[[row for row, _ in ranked]].tolist(), [score for _, score in ranked]))
+    #documents without any query term follow with a score of 0, in collection order
+    if len(rankings) < k:
+        for docid in collection_of_documents.get_docs():
+            if len(rankings) >= k:
+                break
+            rankings.setdefault(docid, 0)
+    return rankings
+
+def max_score_rows(collection_of_documents, query, k, k1=1.2, b=0.75, k2=500):
+    '''Find the k highest scoring documents of a query, document at a time.
+
+    The postings of the query terms are the columns of the collection's term
+    matrix, walked together in collection order.  The upper bound of a term
+    is its BM25 contribution at its highest term frequency, stored by the
+    inverted index, in the shortest possible document.  Once the bounds of
+    the weakest terms add up to less than the k-th best score so far, those
+    terms are non-essential: only documents in the postings of the other
+    terms are visited, and the non-essential postings are searched for them,
+    strongest term first, until a document can no longer reach the k-th
+    score.  Each term's contribution to a document is computed once and the
+    contributions are added in query order like bm25_term_at_a_time, so the
+    scores are the same floats.
+
+    Returns a (ranked, postings_read) tuple: a list of (term matrix row,
+    score) pairs of the top k documents containing a query term, in ranking
+    order, and the number of postings visited or searched.'''
+    index = collection_of_documents.get_inverted_index()
+    statistics = collection_of_documents.get_statistics()
+    term_matrix = collection_of_documents.get_term_matrix()
+    N = statistics.get_num_docs()
+    avg_length = statistics.get_avg_doc_len()
+    #K of an empty document, the smallest K any document can have
+    K_floor = k1 * (1 - b)
+    columns = term_matrix.columns
+    indices, data = memoryview(columns.indices), memoryview(columns.data)
+    doc_lens = memoryview(term_matrix.get_doc_lens())
+
+    #(qfi, ni, start, end, bound) of every query term with postings, in query order
+    terms = []
+    for term_id, qfi in query.get_term_ids(collection_of_documents.get_vocabulary()).items():
+        if term_id >= columns.shape[1]:
+            continue
+        start, end = int(columns.indptr[term_id]), int(columns.indptr[term_id + 1])
+        if start < end:
+            bound = calculate_bm25(N, end - start, index.get_max_term_freq_by_id(term_id), qfi, K_floor, k1, k2)
+            terms.append((qfi, end - start, start, end, bound))
+    weakest = sorted(range(len(terms)), key=lambda term: terms[term][4])
+    #weak_bounds[j] is the sum of the bounds of the j + 1 weakest terms
+    weak_bounds = []
+    for term in weakest:
+        weak_bounds.append((weak_bounds[-1] if weak_bounds else 0) + terms[term][4])
+
+    positions = [start for _, _, start, _, _ in terms]
+    cursors = [(indices[start], term) for term, (_, _, start, _, _) in enumerate(terms)]
+    heapq.heapify(cursors)
+    non_essential = [False] * len(terms)
+    num_non_essential = 0
+    #min-heap of the (score, -row) of the best documents so far, ties won by the earlier row
+    top = []
+    threshold = 0
+    postings_read = 0
+    while cursors:
+        row = cursors[0][0]
+        dl = doc_lens[row]
         K = k1 * ((1 - b) + b * (dl / float(avg_length)))
-        bm25_score = 0  # Initialize bm25_score for each document
-        for term, frequency in query.get_terms().items():
-            if term in document.get_term_freq_dict().keys():
-                ni = sum(1 for doc in collection_of_documents.get_docs().values() if term in doc.get_term_freq_dict())
-                fi = document.get_term_freq_dict().get(term, 0)
-                qfi = frequency
-                bm25_score += calculate_bm25(N, ni, fi, qfi, K, k1, k2)
-        bm25_doc_scores[key] = bm25_score
-
-    sorted_bm25_doc_scores = dict(sorted(bm25_doc_scores.items(), key=lambda item: item[1], reverse=True))
-    return sorted_bm25_doc_scores
+        contributions = [None] * len(terms)
+        partial = 0
+        while cursors and cursors[0][0] == row:
+            _, term = heapq.heappop(cursors)
+            if non_essential[term]:
+                continue
+            qfi, ni, _, end, _ = terms[term]
+            position = positions[term]
+            contributions[term] = calculate_bm25(N, ni, data[position], qfi, K, k1, k2)
+            partial += contributions[term]
+            postings_read += 1
+            positions[term] = position + 1
+            if position + 1 < end:
+                heapq.heappush(cursors, (indices[position + 1], term))
+        #a document only in non-essential postings cannot reach the top k
+        if partial == 0:
+            continue
+
+        pruned = False
+        for weak in range(num_non_essential - 1, -1, -1):
+            if (partial + weak_bounds[weak]) * (1 + BOUND_MARGIN) < threshold:
+                pruned = True
+                break
+            term = weakest[weak]
+            qfi, ni, _, end, _ = terms[term]
+            position = bisect.bisect_left(indices, row, positions[term], end)
+            positions[term] = position
+            postings_read += 1
+            if position < end and indices[position] == row:
+                contributions[term] = calculate_bm25(N, ni, data[position], qfi, K, k1, k2)
+                partial += contributions[term]
+        if pruned:
+            continue
+
+        score = 0
+        for contribution in contributions:
+            if contribution is not None:
+                score = score + contribution
+        if len(top) < k:
+            heapq.heappush(top, (score, -row))
+        elif (score, -row) > top[0]:
+            heapq.heapreplace(top, (score, -row))
+        else:
+            continue
+        if len(top) == k:
+            threshold = top[0][0]
+            while num_non_essential < len(terms) and weak_bounds[num_non_essential] * (1 + BOUND_MARGIN) < threshold:
+                non_essential[weakest[num_non_essential]] = True
+                num_non_essential += 1
+    return [(-negative_row, score) for score, negative_row in sorted(top, reverse=True)], postings_read
+
+def my_bm25_vectorized(collection_of_documents, query, k1=1.2, b=0.75, k2=500, k=None):
+    '''my_bm25 as a sparse matrix-vector product over the collection's term matrix.
+
+    Scores match my_bm25 up to floating point rounding.'''
+    term_matrix = collection_of_documents.get_term_matrix()
+    N = term_matrix.get_num_docs()
+    term_ids, qfi = term_matrix.query_arrays(query.get_term_ids(collection_of_documents.get_vocabulary()))
+    doc_lens = term_matrix.get_doc_lens()
+    avg_length = doc_lens.sum() / N if N else 0
+    K = k1 * ((1 - b) + b * (doc_lens / float(avg_length)))
+
+    #one column per query term, holding the term frequency of each document
+    columns = term_matrix.get_columns(term_ids)
+    fi = columns.data.astype(np.float64)
+    term_freq_component = ((k1 + 1) * fi) / (K[columns.indices] + fi)
+    ni = term_matrix.doc_freq[term_ids]
+    idf = np.log10((3*N - ni + 0.5) / (ni + 0.5))
+    query_freq_component = ((k2 + 1) * qfi) / (k2 + qfi)
+    weights = csc_matrix((term_freq_component, columns.indices, columns.indptr), shape=columns.shape)
+    scores = weights @ (idf * query_freq_component)
+
+    order = top_k_rows(scores, k)
+    return dict(zip(term_matrix.get_docids()[order].tolist(), scores[order].tolist()))
+
+class BM25Scorer:
+    '''BM25 scores of every document of a collection, computed with NumPy.
+
+    The IDF of every term and the length normalisation K of every document
+    are computed once, when the scorer is built; a query then costs one
+    vectorised pass over the postings of each of its terms, read from the
+    collection's term matrix.  Each term's contributions are added in
+    query term order with the arithmetic of calculate_bm25, so the scores
+    are the same floats my_bm25 returns.'''
+
+    def __init__(self, collection_of_documents, k1=1.2, b=0.75, k2=500):
+        self.collection_of_documents = collection_of_documents
+        self.vocabulary = collection_of_documents.get_vocabulary()
+        self.k1, self.b, self.k2 = k1, b, k2
+        statistics = collection_of_documents.get_statistics()
+        term_matrix = collection_of_documents.get_term_matrix()
+        self.term_matrix = term_matrix
+        self.columns = term_matrix.columns
+        N = statistics.get_num_docs()
+        avg_length = statistics.get_avg_doc_len()
+        self.K = k1 * ((1 - b) + b * (term_matrix.get_doc_lens() / float(avg_length))) if N else np.zeros(0)
+        #math.log10 of each distinct document frequency, so the IDF matches calculate_bm25 to the last bit
+        doc_freqs, inverse = np.unique(term_matrix.doc_freq, return_inverse=True)
+        idf_values = np.array([math.log10((3*N - ni + 0.5) / (ni + 0.5)) for ni in doc_freqs.tolist()])
+        self.idf = idf_values[inverse]
+
+    def get_term_weights(self, term_id):
+        '''Get the rows of a term's postings and the IDF times term frequency component of each.'''
+        k1 = self.k1
+        start, end = self.columns.indptr[term_id], self.columns.indptr[term_id + 1]
+        rows = self.columns.indices[start:end]
+        fi = self.columns.data[start:end]
+        term_freq_component = ((k1 + 1) * fi) / (self.K[rows] + fi)
+        return rows, self.idf[term_id] * term_freq_component
+
+    def get_query_terms(self, query):
+        '''Get the (term id, query frequency) pairs of a query's indexed terms, in query order.'''
+        num_terms = self.columns.shape[1]
+        return [(term_id, qfi) for term_id, qfi in query.get_term_ids(self.vocabulary).items() if term_id < num_terms]
+
+    def get_scores(self, query):
+        '''Score a query against every document.
+
+        Returns a (scores, matched) tuple of arrays with one entry per term
+        matrix row: the BM25 score of each document, and whether it contains
+        any query term.'''
+        k2 = self.k2
+        num_docs = self.columns.shape[0]
+        scores = np.zeros(num_docs)
+        matched = np.zeros(num_docs, dtype=bool)
+        for term_id, qfi in self.get_query_terms(query):
+            rows, weights = self.get_term_weights(term_id)
+            query_freq_component = ((k2 + 1) * qfi) / (k2 + qfi)
+            scores[rows] += weights * query_freq_component
+            matched[rows] = True
+        return scores, matched
+
+    def get_batch_scores(self, queries):
+        '''Score every query of a BowQueryColl against every document.
+
+        Returns a (queryids, scores, matched) tuple: the queryids in
+        collection order, and like get_scores, arrays with one row per query.
+        The postings of a term shared by several queries are weighted once,
+        and the n-th terms of all queries are added in one pass, so every
+        query still adds its terms in query order.'''
+        k2 = self.k2
+        num_docs = self.columns.shape[0]
+        queryids = list(queries.get_queries())
+        query_terms = [self.get_query_terms(queries.get_query(queryid)) for queryid in queryids]
+        scores = np.zeros((len(queryids), num_docs))
+        matched = np.zeros((len(queryids), num_docs), dtype=bool)
+        #flat views, a document of query i is entry i * num_docs + row
+        flat_scores, flat_matched = scores.reshape(-1), matched.reshape(-1)
+        term_weights = {}
+        for position in range(max(map(len, query_terms), default=0)):
+            entries, values = [], []
+            for i, terms in enumerate(query_terms):
+                if position >= len(terms):
+                    continue
+                term_id, qfi = terms[position]
+                if term_id not in term_weights:
+                    term_weights[term_id] = self.get_term_weights(term_id)
+                rows, weights = term_weights[term_id]
+                query_freq_component = ((k2 + 1) * qfi) / (k2 + qfi)
+                entries.append(rows + i * num_docs)
+                values.append(weights * query_freq_component)
+            #a query has each document at most once per term, so no entry repeats
+            entries = np.concatenate(entries)
+            flat_scores[entries] += np.concatenate(values)
+            flat_matched[entries] = True
+        return queryids, scores, matched
+
+    def get_ranking(self, scores, matched, order):
+        '''Get the docid:score dictionary of get_scores arrays for some rows, in ranking order.'''
+        docids = self.term_matrix.get_docids()[order].tolist()
+        values = [score if is_matched else 0 for score, is_matched in zip(scores[order].tolist(), matched[order].tolist())]
+        return dict(zip(docids, values))
+
+    def score(self, query, k=None):
+        '''Score a query and return the k highest scoring documents like my_bm25.
+
+        Documents without any query term have a score of 0.'''
+        scores, matched = self.get_scores(query)
+        return self.get_ranking(scores, matched, top_k_rows(scores, k))
+
+    def score_batch(self, queries, k=None):
+        '''Score every query of a BowQueryColl and return a queryid:ranking dictionary.
+
+        Each ranking is the one score returns for that query.'''
+        queryids, scores, matched = self.get_batch_scores(queries)
+        orders = top_k_matrix_rows(scores, k)
+        return {queryid: self.get_ranking(scores[i], matched[i], orders[i]) for i, queryid in enumerate(queryids)}
+
 
 def perform_bm25(collection_of_queries, data_collection):
 
@@ -51,16 +337,11 @@ def perform_bm25(collection_of_queries, data_collection):
         #get the document collection
         collection_of_documents = data_collection.get_collection(document_collection_position)
         #get the document frequency which is a dictionary with term as key and term frequency as value
-        rankings =my_bm25(collection_of_documents, query)
-        # Cut the dictionary to only have the first 15 pairs
-        top_15_rankings = {}
-        for i, (doc_id, score) in enumerate(rankings.items()):
-            if i >= 15:
-                break
-            top_15_rankings[doc_id] = score
+        #only the first TOP_K documents are ranked and saved
+        rankings = BM25Scorer(collection_of_documents).score(query, TOP_K)
         #save the rankings to a file
         bm25_file_handler = FileHandler(KeyValueFile())
-        bm25_file_handler.save(top_15_rankings, output_file)
+        bm25_file_handler.save(rankings, output_file)
         document_collection_position += 1
         query_position += 1
     #change directory back to the root directory
@@ -2,19 +2,52 @@
 """Iterator over a collection."""
 
 from bow_coll_inorder_iterator import BowCollInorderIterator
+from collection_statistics import CollectionStatistics
+from inverted_index import InvertedIndex
+from term_matrix import TermMatrix
+from vocabulary import Vocabulary
 
 class BowDocColl:
     """Collection of BOW documents."""
 
-    def __init__(self):
+    def __init__(self, vocabulary=None):
         """Constructor.
 
-        Creates an empty collection."""
+        Creates an empty collection.  The index and statistics of the
+        collection key terms by their ids in the given vocabulary; a private
+        vocabulary is created if none is given."""
         self.docs = {}
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.index = None
+        self.statistics = None
+        self.term_matrix = None
 
     def add_doc(self, doc):
-        """Add a document to the collection."""
-        self.docs[doc.get_docid()] = doc
+        """Add a document to the collection.
+
+        A document with the same docid as an existing one replaces it.  The
+        cached collection statistics and term matrix are dropped, to be
+        rebuilt on next use."""
+        docid = doc.get_docid()
+        if self.index is not None:
+            if docid in self.docs:
+                self.index.remove_doc(self.docs[docid])
+            self.index.add_doc(doc)
+        self.docs[docid] = doc
+        self.statistics = None
+        self.term_matrix = None
+
+    def remove_doc(self, docid):
+        """Remove a document from the collection by docid.
+
+        Will raise a KeyError if there is no document with that ID.  Like
+        add_doc, this keeps the index up to date and drops the cached
+        statistics and term matrix."""
+        doc = self.docs.pop(docid)
+        if self.index is not None:
+            self.index.remove_doc(doc)
+        self.statistics = None
+        self.term_matrix = None
 
     def get_doc(self, docid):
         """Return a document by docid.
@@ -28,6 +61,38 @@ class BowDocColl:
         Returns a dictionary, with docids as keys, and docs as values."""
         return self.docs
 
+    def get_inverted_index(self):
+        """Get the inverted index of the collection.
+
+        The index is built on first use and kept up to date by add_doc."""
+        if self.index is None:
+            self.index = InvertedIndex(self.vocabulary)
+            for doc in self.docs.values():
+                self.index.add_doc(doc)
+        return self.index
+
+    def get_vocabulary(self):
+        """Get the vocabulary the collection's term ids refer to."""
+        return self.vocabulary
+
+    def get_statistics(self):
+        """Get the term and length statistics of the collection.
+
+        The statistics are computed on first use and cached until the next
+        call to add_doc."""
+        if self.statistics is None:
+            self.statistics = CollectionStatistics(self)
+        return self.statistics
+
+    def get_term_matrix(self):
+        """Get the sparse document-term matrix of the collection.
+
+        The matrix is built on first use and cached until the next call to
+        add_doc."""
+        if self.term_matrix is None:
+            self.term_matrix = TermMatrix.from_collection(self)
+        return self.term_matrix
+
     def inorder_iter(self):
         """Return an ordered iterator over the documents.
         
@@ -47,18 +112,12 @@ class BowDocColl:
         return self.inorder_iter()
     
     def get_collection_term_frequency(self):
-        """Get the term frequency in the collection."""
-        term_freq = {}
-        for doc in self.docs.values():
-            for term in doc.get_term_list():
-                try:
-                    term_freq[term] += doc.get_term_count(term)
-                except KeyError:
-                    term_freq[term] = doc.get_term_count(term)
-        return term_freq
+        """Get the term frequency in the collection.
+
+        Returns the cached dictionary of the collection statistics, which
+        must not be modified."""
+        return self.get_statistics().get_coll_freq_dict()
     
     def get_total_term_frequency(self):
         """Get the total term frequency in the collection."""
-        term_freq = self.get_collection_term_frequency()
-        total_freq = sum(term_freq.values())
-        return total_freq
\ No newline at end of file
+        return self.get_statistics().get_total_term_frequency()
@@ -22,6 +22,12 @@ class BowDoc:
         except KeyError:  
             self.terms[term] = 1
 
+    def add_term_counts(self, term_counts):
+        """Add the occurrences of many terms from a term:count dictionary."""
+        terms = self.terms
+        for term, count in term_counts.items():
+            terms[term] = terms.get(term, 0) + count
+
     def get_term_count(self, term):
         """Get the term occurrence count for a term.
 
@@ -35,10 +41,20 @@ class BowDoc:
         """Return dictionary of term:freq pairs."""
         return self.terms
 
+    def get_term_id_freqs(self, vocabulary):
+        """Return list of (term id, freq) pairs.
+
+        Terms not yet in the vocabulary are added to it."""
+        return [(vocabulary.add_term(term), freq) for term, freq in self.terms.items()]
+
     def get_term_list(self):
         """Get sorted list of all terms occurring in the document."""
         return sorted(self.terms.keys())
 
+    def get_num_terms(self):
+        """Get the number of distinct terms in the document."""
+        return len(self.terms)
+
     def get_docid(self):
         """Get the ID of the document."""
         return self.docid
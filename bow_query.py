@@ -30,6 +30,12 @@ class BowQuery:
         except KeyError:  
             self.terms[term] = 1
 
+    def add_term_counts(self, term_counts):
+        """Add the occurrences of many terms from a term:count dictionary."""
+        terms = self.terms
+        for term, count in term_counts.items():
+            terms[term] = terms.get(term, 0) + count
+
     def get_term_count(self, term):
         """Get the term occurrence count for a term.
 
@@ -43,6 +49,13 @@ class BowQuery:
         """Return dictionary of term:freq pairs."""
         return self.terms
 
+    def get_term_ids(self, vocabulary):
+        """Return dictionary of term id:freq pairs.
+
+        Terms missing from the vocabulary are left out."""
+        term_ids = vocabulary.term_ids
+        return {term_ids[term]: freq for term, freq in self.terms.items() if term in term_ids}
+
     def get_term_list(self):
         """Get sorted list of all terms occurring in the query."""
         return sorted(self.terms.keys())
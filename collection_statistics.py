@@ -0,0 +1,90 @@
+class CollectionStatistics:
+    """Term and length statistics of a collection of BOW documents.
+
+    All statistics are gathered in a single pass over the documents when the
+    object is created, so it must be rebuilt whenever the collection changes.
+    BowDocColl.get_statistics takes care of that.  Term statistics are kept
+    by the term ids of the collection's vocabulary."""
+
+    def __init__(self, coll):
+        """Constructor.
+
+        Takes the collection to gather the statistics of as sole argument."""
+        self.vocabulary = coll.get_vocabulary()
+        self.doc_freq = {}
+        self.coll_freq = {}
+        self.doc_lens = {}
+        self.total_terms = 0
+        self.total_doc_len = 0
+        self.doc_freq_dict = None
+        self.coll_freq_dict = None
+        for docid, doc in coll.get_docs().items():
+            for term_id, frequency in doc.get_term_id_freqs(self.vocabulary):
+                try:
+                    self.doc_freq[term_id] += 1
+                    self.coll_freq[term_id] += frequency
+                except KeyError:
+                    self.doc_freq[term_id] = 1
+                    self.coll_freq[term_id] = frequency
+                self.total_terms += frequency
+            doc_len = doc.get_doc_len()
+            self.doc_lens[docid] = doc_len
+            self.total_doc_len += doc_len
+
+    def get_num_docs(self):
+        """Get the number of documents in the collection."""
+        return len(self.doc_lens)
+
+    def get_doc_freq(self, term):
+        """Get the number of documents containing a term.
+
+        Returns 0 if the term does not appear in the collection."""
+        return self.doc_freq.get(self.vocabulary.term_ids.get(term), 0)
+
+    def get_doc_freq_by_id(self, term_id):
+        """Get the number of documents containing a term, by term id."""
+        return self.doc_freq.get(term_id, 0)
+
+    def get_coll_freq(self, term):
+        """Get the number of occurrences of a term in the collection.
+
+        Returns 0 if the term does not appear in the collection."""
+        return self.coll_freq.get(self.vocabulary.term_ids.get(term), 0)
+
+    def get_coll_freq_by_id(self, term_id):
+        """Get the number of occurrences of a term in the collection, by term id."""
+        return self.coll_freq.get(term_id, 0)
+
+    def get_doc_freq_dict(self):
+        """Return dictionary of term:document frequency pairs.
+
+        The dictionary is built on first use and must not be modified."""
+        if self.doc_freq_dict is None:
+            terms = self.vocabulary.terms
+            self.doc_freq_dict = {terms[term_id]: df for term_id, df in self.doc_freq.items()}
+        return self.doc_freq_dict
+
+    def get_coll_freq_dict(self):
+        """Return dictionary of term:collection frequency pairs.
+
+        The dictionary is built on first use and must not be modified."""
+        if self.coll_freq_dict is None:
+            terms = self.vocabulary.terms
+            self.coll_freq_dict = {terms[term_id]: cf for term_id, cf in self.coll_freq.items()}
+        return self.coll_freq_dict
+
+    def get_total_term_frequency(self):
+        """Get the number of term occurrences in the collection."""
+        return self.total_terms
+
+    def get_doc_len(self, docid):
+        """Get the length of a document by docid.
+
+        Will raise a KeyError if there is no document with that ID."""
+        return self.doc_lens[docid]
+
+    def get_avg_doc_len(self):
+        """Get the average document length of the collection."""
+        if not self.doc_lens:
+            return 0
+        return self.total_doc_len / len(self.doc_lens)
@@ -0,0 +1,111 @@
+from array import array
+from bisect import bisect_left
+
+
+class CompactBowDoc:
+    """Compact bag-of-words representation of a document.
+
+    Offers the same interface as BowDoc, but instead of a dictionary of term
+    strings the document keeps two parallel arrays: the ids of its terms in a
+    shared Vocabulary, and their counts.  Terms are kept sorted by term id,
+    so they are looked up by binary search; code filling the arrays directly
+    must keep that order."""
+
+    __slots__ = ('docid', 'doc_len', 'vocabulary', 'term_ids', 'counts')
+
+    def __init__(self, docid, vocabulary):
+        """Constructor.
+
+        Set the ID of the document and the vocabulary its terms are stored
+        against.  Call add_term to add terms to the document."""
+        self.docid = docid
+        self.doc_len = 0
+        self.vocabulary = vocabulary
+        self.term_ids = array('I')
+        self.counts = array('I')
+
+    @classmethod
+    def from_bow_doc(cls, doc, vocabulary):
+        """Create a compact copy of a BowDoc, adding its terms to the vocabulary."""
+        compact_doc = cls(doc.get_docid(), vocabulary)
+        term_id_freqs = sorted((vocabulary.add_term(term), frequency) for term, frequency in doc.get_term_freq_dict().items())
+        for term_id, frequency in term_id_freqs:
+            compact_doc.term_ids.append(term_id)
+            compact_doc.counts.append(frequency)
+        compact_doc.doc_len = doc.get_doc_len()
+        return compact_doc
+
+    def find_term(self, term_id):
+        """Get the position of a term id in the term arrays, or None if the document does not contain it."""
+        index = bisect_left(self.term_ids, term_id)
+        if index < len(self.term_ids) and self.term_ids[index] == term_id:
+            return index
+        return None
+
+    def add_term(self, term):
+        """Add a term occurrence to the BOW representation.
+
+        This should be called each time the term occurs in the document."""
+        term_id = self.vocabulary.add_term(term)
+        index = bisect_left(self.term_ids, term_id)
+        if index < len(self.term_ids) and self.term_ids[index] == term_id:
+            self.counts[index] += 1
+            return
+        self.term_ids.insert(index, term_id)
+        self.counts.insert(index, 1)
+
+    def get_term_count(self, term):
+        """Get the term occurrence count for a term.
+
+        Returns 0 if the term does not appear in the document."""
+        try:
+            position = self.find_term(self.vocabulary.get_term_id(term))
+        except KeyError:
+            return 0
+        return 0 if position is None else self.counts[position]
+
+    def get_term_freq_dict(self):
+        """Return dictionary of term:freq pairs.
+
+        The dictionary is built on every call; prefer get_term_count for
+        single lookups."""
+        terms = self.vocabulary.terms
+        return {terms[term_id]: count for term_id, count in zip(self.term_ids, self.counts)}
+
+    def get_term_id_freqs(self, vocabulary):
+        """Return list of (term id, freq) pairs.
+
+        Terms not yet in the vocabulary are added to it."""
+        if vocabulary is self.vocabulary:
+            return list(zip(self.term_ids, self.counts))
+        terms = self.vocabulary.terms
+        return [(vocabulary.add_term(terms[term_id]), count)
+                for term_id, count in zip(self.term_ids, self.counts)]
+
+    def get_term_list(self):
+        """Get sorted list of all terms occurring in the document."""
+        terms = self.vocabulary.terms
+        return sorted(terms[term_id] for term_id in self.term_ids)
+
+    def get_num_terms(self):
+        """Get the number of distinct terms in the document."""
+        return len(self.term_ids)
+
+    def get_docid(self):
+        """Get the ID of the document."""
+        return self.docid
+
+    def __iter__(self):
+        """Return an ordered iterator over term--frequency pairs.
+
+        Each element is a (term, frequency) tuple.  They are iterated
+        in term's frequency descending order."""
+        return iter(sorted(self.get_term_freq_dict().items(), key=lambda x: x[1], reverse=True))
+
+    def get_doc_len(self):
+        """Get the number of terms in the document."""
+        return self.doc_len
+
+    def set_doc_len(self, doc_len):
+        """Set the number of terms in the document."""
+        self.doc_len = doc_len
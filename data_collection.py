@@ -1,11 +1,16 @@
+from vocabulary import Vocabulary
+
+
 class DataCollection:
     """A collection of BowDocColl objects."""
 
-    def __init__(self):
+    def __init__(self, vocabulary=None):
         """Constructor.
 
-        Creates an empty collection."""
+        Creates an empty collection with a vocabulary shared by all of its
+        BowDocColl objects.  A new vocabulary is created if none is given."""
         self.collections = []
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
 
     def add_collection(self, collection):
         """Add a BowDocColl to the collection."""
@@ -17,6 +22,10 @@ class DataCollection:
         Will raise an IndexError if the index is out of range."""
         return self.collections[index]
 
+    def get_vocabulary(self):
+        """Get the vocabulary shared by the collections."""
+        return self.vocabulary
+
     def get_num_collections(self):
         """Get the number of BowDocColl objects in the collection."""
         return len(self.collections)
\ No newline at end of file
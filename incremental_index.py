@@ -0,0 +1,255 @@
+'''Incremental indexing of a collection folder.
+
+An IncrementalIndex keeps a parsed DataCollection in step with the XML
+files under a collection folder without reparsing files that did not
+change.  Its index directory holds a manifest and a list of segments.  A
+segment is an index_store file holding the documents parsed by one update.
+The manifest records, for every XML file, its modification time, size,
+SHA-1 digest, docid and the segment its document lives in, and the
+fingerprint of the analyzer the files were parsed with.  An index parsed
+with other stopwords or another stemmer is dropped on load and rebuilt by
+the next update.
+
+Every call to update scans the folder and parses only new or modified
+files, which are found by modification time and size and confirmed by
+digest.  The parsed documents are written as a new segment and added to
+the in-memory BowDocColl objects straight away.  Their statistics are
+rebuilt on next use, so BM25 and JM see the new df and avgdl at once.
+Removed files drop their documents.  merge_segments folds all segments
+into one, and start_background_merge does that periodically on a thread.
+
+Update an index from the command line with
+
+    python incremental_index.py <coll-dir> <index-dir>
+'''
+import hashlib
+import json
+import os
+import sys
+import threading
+from analyzer import Analyzer
+from bow__doc_coll import BowDocColl
+from compact_bow_doc import CompactBowDoc
+from data_collection import DataCollection
+from index_store import IndexFile, read_collection_docs, write_index
+from parse import list_collection_files, parse_document_file
+
+MANIFEST = 'manifest.json'
+
+
+def file_digest(file_path):
+    '''Get the SHA-1 hex digest of a file's content.'''
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IncrementalIndex:
+    '''Segmented index of a collection folder that is updated file by file.'''
+
+    def __init__(self, inputpath, index_dir, stop_words, max_segments=4, stemmer=None):
+        '''Constructor.
+
+        Takes the collection folder, the directory to keep the manifest and
+        segments in, the stopwords to parse with, the number of segments
+        above which the background merge folds them together, and the
+        stemmer to parse with (the cached Porter2 stemmer if none is given).
+        Loads the index if the directory already holds one; call update to
+        bring it in step with the folder.'''
+        self.inputpath = os.path.abspath(inputpath)
+        self.index_dir = os.path.abspath(index_dir)
+        self.stop_words = stop_words
+        self.analyzer = Analyzer(stop_words, stemmer)
+        self.max_segments = max_segments
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.merge_thread = None
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.manifest = self.new_manifest()
+        self.data_collection = DataCollection()
+        self.load()
+
+    def new_manifest(self):
+        '''Get the manifest of an empty index.'''
+        return {'collections': [], 'files': {}, 'segments': [], 'next_segment': 0,
+                'fingerprint': self.analyzer.get_fingerprint()}
+
+    def load(self):
+        '''Load the manifest and the live documents of every segment.
+
+        An index parsed with another analyzer fingerprint is dropped instead,
+        so the next update parses every file again.'''
+        manifest_path = os.path.join(self.index_dir, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest.get('fingerprint') != self.manifest['fingerprint']:
+            self.save_manifest()
+            for segment in manifest['segments']:
+                os.remove(os.path.join(self.index_dir, segment))
+            return
+        self.manifest = manifest
+        segments = self.manifest['segments']
+        #term ids never change, so the vocabulary of the newest segment covers all older ones
+        index_files = [IndexFile(os.path.join(self.index_dir, segment)) for segment in segments]
+        vocabulary = index_files[-1].get_vocabulary() if index_files else None
+        self.data_collection = DataCollection(vocabulary)
+        vocabulary = self.data_collection.get_vocabulary()
+        collections = {}
+        for name in self.manifest['collections']:
+            collections[name] = BowDocColl(vocabulary)
+            self.data_collection.add_collection(collections[name])
+
+        live = {(entry['collection'], entry['docid']): entry['segment'] for entry in self.manifest['files'].values()}
+        for segment, index_file in zip(segments, index_files):
+            for i in range(index_file.get_num_collections()):
+                name = self.manifest['collections'][i]
+                for document in read_collection_docs(index_file, i, vocabulary):
+                    if live.get((name, document.get_docid())) == segment:
+                        collections[name].add_doc(document)
+
+    def save_manifest(self):
+        '''Write the manifest, replacing the old one in a single step.'''
+        manifest_path = os.path.join(self.index_dir, MANIFEST)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def scan(self):
+        '''List the XML files of the collection folder.
+
+        Returns a dictionary with paths relative to the folder as keys and
+        (collection name, absolute path, stat result) tuples as values, in
+        the order parse_documents reads them.'''
+        found = {}
+        for folder, file_paths in list_collection_files(self.inputpath):
+            for file_path in file_paths:
+                found[f'{folder}/{os.path.basename(file_path)}'] = (folder, file_path, os.stat(file_path))
+        return found
+
+    def get_collection(self, name):
+        '''Get the BowDocColl of a collection folder, adding it if it is new.'''
+        collections = self.manifest['collections']
+        if name not in collections:
+            collections.append(name)
+            self.data_collection.add_collection(BowDocColl(self.data_collection.get_vocabulary()))
+        return self.data_collection.get_collection(collections.index(name))
+
+    def update(self):
+        '''Parse new and modified files, drop removed ones, and write a new segment.
+
+        Returns a (parsed, removed) tuple with the number of files of each kind.'''
+        with self.lock:
+            files = self.manifest['files']
+            scanned = self.scan()
+            changed = []
+            touched = False
+            for rel_path, (name, file_path, stat) in scanned.items():
+                entry = files.get(rel_path)
+                if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    continue
+                digest = file_digest(file_path)
+                if entry is not None and entry['sha1'] == digest:
+                    entry['mtime_ns'], entry['size'] = stat.st_mtime_ns, stat.st_size
+                    touched = True
+                    continue
+                changed.append((rel_path, name, file_path, stat, digest))
+            removed = [rel_path for rel_path in files if rel_path not in scanned]
+
+            vocabulary = self.data_collection.get_vocabulary()
+            for rel_path in removed:
+                entry = files.pop(rel_path)
+                collection = self.get_collection(entry['collection'])
+                if entry['docid'] in collection.get_docs():
+                    collection.remove_doc(entry['docid'])
+
+            if changed:
+                segment = f'segment_{self.manifest["next_segment"]:06d}.idx'
+                self.manifest['next_segment'] += 1
+                parsed = {}
+                for rel_path, name, file_path, stat, digest in changed:
+                    document = parse_document_file(self.stop_words, file_path, analyzer=self.analyzer)
+                    document = CompactBowDoc.from_bow_doc(document, vocabulary)
+                    collection = self.get_collection(name)
+                    entry = files.get(rel_path)
+                    if entry is not None and entry['docid'] != document.get_docid() and entry['docid'] in collection.get_docs():
+                        collection.remove_doc(entry['docid'])
+                    collection.add_doc(document)
+                    parsed.setdefault(name, []).append(document)
+                    files[rel_path] = {'collection': name, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                       'sha1': digest, 'docid': document.get_docid(), 'segment': segment}
+
+                #the segment holds one BowDocColl per known collection, in manifest order
+                segment_collection = DataCollection(vocabulary)
+                for name in self.manifest['collections']:
+                    bow_doc_coll = BowDocColl(vocabulary)
+                    for document in parsed.get(name, []):
+                        bow_doc_coll.add_doc(document)
+                    segment_collection.add_collection(bow_doc_coll)
+                write_index(segment_collection, os.path.join(self.index_dir, segment))
+                self.manifest['segments'].append(segment)
+
+            if changed or removed or touched:
+                self.save_manifest()
+            return len(changed), len(removed)
+
+    def merge_segments(self, max_segments=1):
+        '''Fold all segments into a single one holding only live documents.
+
+        Segments are only merged when there are more than max_segments of
+        them.  Returns True if segments were merged.'''
+        with self.lock:
+            old_segments = self.manifest['segments']
+            if len(old_segments) <= max_segments:
+                return False
+            segment = f'segment_{self.manifest["next_segment"]:06d}.idx'
+            self.manifest['next_segment'] += 1
+            #the in-memory collections hold exactly the live documents
+            write_index(self.data_collection, os.path.join(self.index_dir, segment))
+            for entry in self.manifest['files'].values():
+                entry['segment'] = segment
+            self.manifest['segments'] = [segment]
+            self.save_manifest()
+            for old_segment in old_segments:
+                os.remove(os.path.join(self.index_dir, old_segment))
+            return True
+
+    def merge_loop(self, interval):
+        '''Merge segments every interval seconds while there are too many of them.'''
+        while not self.stop_event.wait(interval):
+            self.merge_segments(self.max_segments)
+
+    def start_background_merge(self, interval=60.0):
+        '''Start merging segments periodically on a background thread.'''
+        if self.merge_thread is not None:
+            return
+        self.stop_event.clear()
+        self.merge_thread = threading.Thread(target=self.merge_loop, args=(interval,), daemon=True)
+        self.merge_thread.start()
+
+    def stop_background_merge(self):
+        '''Stop the background merge thread and wait for it to finish.'''
+        if self.merge_thread is None:
+            return
+        self.stop_event.set()
+        self.merge_thread.join()
+        self.merge_thread = None
+
+    def get_data_collection(self):
+        '''Get the DataCollection holding the live documents of the index.'''
+        return self.data_collection
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.stderr.write("USAGE: %s <coll-dir> <index-dir>\n" % sys.argv[0])
+        sys.exit()
+    from parse import get_stopwords
+    incremental_index = IncrementalIndex(sys.argv[1], sys.argv[2], get_stopwords())
+    parsed, removed = incremental_index.update()
+    incremental_index.merge_segments(incremental_index.max_segments)
+    print(f"Parsed {parsed} files, removed {removed} files, "
+          f"{len(incremental_index.manifest['segments'])} segments")
@@ -0,0 +1,307 @@
+'''Lazy, memory-mapped access to the collections of a binary index file.
+
+open_index returns a DataCollection whose collections are IndexedDocColl
+views on the mapped index file written by index_store.  A view offers the
+interface of BowDocColl that the rankers use, but only builds the
+documents, postings and statistics a caller actually asks for.'''
+from collections.abc import Mapping
+import numpy as np
+from bow_coll_inorder_iterator import BowCollInorderIterator
+from data_collection import DataCollection
+from index_store import IndexFile, stored_doc
+from postings_codec import decode_postings
+from term_matrix import TermMatrix
+
+
+class IndexedDocs(Mapping):
+    '''Read-only docid:document mapping over an IndexedDocColl.
+
+    Documents are built from the index file each time they are looked up.'''
+
+    def __init__(self, coll):
+        self.coll = coll
+
+    def __getitem__(self, docid):
+        return self.coll.get_doc(docid)
+
+    def __iter__(self):
+        return iter(self.coll.docids.tolist())
+
+    def __len__(self):
+        return len(self.coll.docids)
+
+
+class IndexedPostings:
+    '''Inverted index of an IndexedDocColl, read from the index file.
+
+    Offers the lookup interface of InvertedIndex.  Compressed postings are
+    decoded per term on lookup.'''
+
+    def __init__(self, coll):
+        self.coll = coll
+        self.vocabulary = coll.get_vocabulary()
+        self.term_ids = coll.arrays['term_ids']
+        self.term_ptr = coll.arrays['term_ptr']
+        self.compressed = coll.index_file.get_compression() is not None
+
+    def find_term(self, term_id):
+        '''Get the position of a term id in the index, or None if it is not indexed.'''
+        pos = int(np.searchsorted(self.term_ids, term_id))
+        if pos < len(self.term_ids) and self.term_ids[pos] == term_id:
+            return pos
+        return None
+
+    def get_postings_arrays(self, pos):
+        '''Get the postings of the term at a position in the index.
+
+        Returns a (rows, tfs) tuple of arrays, with the rows of the documents
+        containing the term in ascending order.'''
+        arrays = self.coll.arrays
+        if not self.compressed:
+            start, end = int(self.term_ptr[pos]), int(self.term_ptr[pos + 1])
+            return arrays['post_rows'][start:end], arrays['post_tfs'][start:end]
+        first, last = int(arrays['term_block_ptr'][pos]), int(arrays['term_block_ptr'][pos + 1])
+        return decode_postings(arrays['post_data'], arrays['block_ptr'][first:last + 1],
+                               arrays['row_widths'][first:last], arrays['tf_widths'][first:last],
+                               int(self.term_ptr[pos + 1] - self.term_ptr[pos]))
+
+    def get_postings_by_id(self, term_id):
+        '''Get the postings of a term by its id, as a docid:term frequency dictionary.'''
+        pos = self.find_term(term_id)
+        if pos is None:
+            return {}
+        rows, tfs = self.get_postings_arrays(pos)
+        return dict(zip(self.coll.docids[rows].tolist(), tfs.tolist()))
+
+    def get_postings(self, term):
+        '''Get the postings of a term, as a docid:term frequency dictionary.'''
+        term_id = self.vocabulary.term_ids.get(term)
+        if term_id is None:
+            return {}
+        return self.get_postings_by_id(term_id)
+
+    def get_max_term_freq_by_id(self, term_id):
+        '''Get the highest frequency of a term in any document, by term id.
+
+        Index files written before the maximum was stored read it from the
+        postings of the term.'''
+        pos = self.find_term(term_id)
+        if pos is None:
+            return 0
+        if 'term_max_tfs' in self.coll.arrays:
+            return int(self.coll.arrays['term_max_tfs'][pos])
+        return int(self.get_postings_arrays(pos)[1].max())
+
+    def get_doc_freq_by_id(self, term_id):
+        '''Get the number of documents containing a term, by term id.'''
+        pos = self.find_term(term_id)
+        if pos is None:
+            return 0
+        return int(self.term_ptr[pos + 1] - self.term_ptr[pos])
+
+    def get_doc_freq(self, term):
+        '''Get the number of documents containing a term.'''
+        term_id = self.vocabulary.term_ids.get(term)
+        if term_id is None:
+            return 0
+        return self.get_doc_freq_by_id(term_id)
+
+    def get_term_ids(self):
+        '''Get sorted list of the ids of all indexed terms.'''
+        return self.term_ids.tolist()
+
+    def get_terms(self):
+        '''Get sorted list of all indexed terms.'''
+        terms = self.vocabulary.terms
+        return sorted(terms[term_id] for term_id in self.term_ids.tolist())
+
+    def get_num_terms(self):
+        '''Get the number of distinct terms in the index.'''
+        return len(self.term_ids)
+
+    def __contains__(self, term):
+        '''Check whether a term occurs in any indexed document.'''
+        return self.get_doc_freq(term) > 0
+
+
+class IndexedStatistics:
+    '''Collection statistics of an IndexedDocColl, read from the index file.
+
+    Offers the interface of CollectionStatistics.  Per-term statistics are
+    computed from the postings of the term when asked for.'''
+
+    def __init__(self, coll):
+        self.coll = coll
+        self.postings = coll.get_inverted_index()
+        self.vocabulary = coll.get_vocabulary()
+        self.doc_lens = coll.arrays['doc_lens']
+        self.doc_freq_dict = None
+        self.coll_freq_dict = None
+
+    def get_num_docs(self):
+        '''Get the number of documents in the collection.'''
+        return len(self.doc_lens)
+
+    def get_doc_freq(self, term):
+        '''Get the number of documents containing a term.'''
+        return self.postings.get_doc_freq(term)
+
+    def get_doc_freq_by_id(self, term_id):
+        '''Get the number of documents containing a term, by term id.'''
+        return self.postings.get_doc_freq_by_id(term_id)
+
+    def get_coll_freq_by_id(self, term_id):
+        '''Get the number of occurrences of a term in the collection, by term id.'''
+        pos = self.postings.find_term(term_id)
+        if pos is None:
+            return 0
+        _, tfs = self.postings.get_postings_arrays(pos)
+        return int(tfs.sum())
+
+    def get_coll_freq(self, term):
+        '''Get the number of occurrences of a term in the collection.'''
+        term_id = self.vocabulary.term_ids.get(term)
+        if term_id is None:
+            return 0
+        return self.get_coll_freq_by_id(term_id)
+
+    def get_doc_freq_dict(self):
+        '''Return dictionary of term:document frequency pairs.
+
+        The dictionary is built on first use and must not be modified.'''
+        if self.doc_freq_dict is None:
+            terms = self.vocabulary.terms
+            doc_freqs = np.diff(self.postings.term_ptr.astype(np.int64))
+            self.doc_freq_dict = {terms[term_id]: df for term_id, df in zip(self.postings.term_ids.tolist(), doc_freqs.tolist())}
+        return self.doc_freq_dict
+
+    def get_coll_freq_dict(self):
+        '''Return dictionary of term:collection frequency pairs.
+
+        The dictionary is built on first use and must not be modified.'''
+        if self.coll_freq_dict is None:
+            terms = self.vocabulary.terms
+            #summed over the forward index, which is never compressed
+            coll_freqs = np.bincount(self.coll.arrays['doc_terms'], weights=self.coll.arrays['doc_counts'])
+            term_ids = self.postings.term_ids.tolist()
+            self.coll_freq_dict = {terms[term_id]: int(coll_freqs[term_id]) for term_id in term_ids}
+        return self.coll_freq_dict
+
+    def get_total_term_frequency(self):
+        '''Get the number of term occurrences in the collection.'''
+        return int(self.coll.arrays['doc_counts'].sum())
+
+    def get_doc_len(self, docid):
+        '''Get the length of a document by docid.'''
+        return int(self.doc_lens[self.coll.get_row(docid)])
+
+    def get_avg_doc_len(self):
+        '''Get the average document length of the collection.'''
+        if not len(self.doc_lens):
+            return 0
+        return int(self.doc_lens.sum()) / len(self.doc_lens)
+
+
+class IndexedDocColl:
+    '''Read-only view of a BowDocColl stored in a binary index file.
+
+    Offers the read interface of BowDocColl.  Arrays are zero-copy views on
+    the mapped file; documents, postings and statistics are only built for
+    what a caller asks for.'''
+
+    def __init__(self, index_file, position, vocabulary):
+        '''Constructor.
+
+        Takes the mapped index file, the position of the collection in it, and
+        the vocabulary shared by all collections of the file.'''
+        self.index_file = index_file
+        self.position = position
+        self.vocabulary = vocabulary
+        self.arrays = index_file.get_collection_arrays(position)
+        self.docids = self.arrays['docids']
+        self.docid_order = None
+        self.index = None
+        self.statistics = None
+        self.term_matrix = None
+
+    def get_row(self, docid):
+        '''Get the position of a document in the collection.
+
+        Will raise a KeyError if there is no document with that ID.'''
+        if self.docid_order is None:
+            self.docid_order = np.argsort(self.docids, kind='stable')
+        sorted_pos = int(np.searchsorted(self.docids, docid, sorter=self.docid_order))
+        if sorted_pos < len(self.docids):
+            row = int(self.docid_order[sorted_pos])
+            if self.docids[row] == docid:
+                return row
+        raise KeyError(docid)
+
+    def get_doc(self, docid):
+        '''Return a document by docid, built from the index file.
+
+        Will raise a KeyError if there is no document with that ID.'''
+        row = self.get_row(docid)
+        start, end = int(self.arrays['doc_ptr'][row]), int(self.arrays['doc_ptr'][row + 1])
+        return stored_doc(int(docid), self.vocabulary, self.arrays['doc_terms'][start:end],
+                          self.arrays['doc_counts'][start:end], int(self.arrays['doc_lens'][row]))
+
+    def get_docs(self):
+        '''Get a read-only docid:document mapping over the collection.'''
+        return IndexedDocs(self)
+
+    def get_num_docs(self):
+        '''Get the number of documents in the collection.'''
+        return len(self.docids)
+
+    def get_vocabulary(self):
+        '''Get the vocabulary the collection's term ids refer to.'''
+        return self.vocabulary
+
+    def get_inverted_index(self):
+        '''Get the inverted index of the collection, reading postings on demand.'''
+        if self.index is None:
+            self.index = IndexedPostings(self)
+        return self.index
+
+    def get_statistics(self):
+        '''Get the term and length statistics of the collection.'''
+        if self.statistics is None:
+            self.statistics = IndexedStatistics(self)
+        return self.statistics
+
+    def get_term_matrix(self):
+        '''Get the sparse document-term matrix of the collection.'''
+        if self.term_matrix is None:
+            self.term_matrix = TermMatrix(self.arrays['doc_counts'], self.arrays['doc_terms'], self.arrays['doc_ptr'],
+                                          self.docids, self.arrays['doc_lens'], len(self.vocabulary))
+        return self.term_matrix
+
+    def get_collection_term_frequency(self):
+        '''Get the term frequency in the collection.'''
+        return self.get_statistics().get_coll_freq_dict()
+
+    def get_total_term_frequency(self):
+        '''Get the total term frequency in the collection.'''
+        return self.get_statistics().get_total_term_frequency()
+
+    def inorder_iter(self):
+        '''Return an iterator over the documents in docid order.'''
+        return BowCollInorderIterator(self)
+
+    def __iter__(self):
+        '''Iterator interface.
+
+        See inorder_iter.'''
+        return self.inorder_iter()
+
+
+def open_index(index_path):
+    '''Open a binary index file as a DataCollection of IndexedDocColl views.
+
+    Only the vocabulary is read up front.'''
+    index_file = IndexFile(index_path)
+    data_collection = DataCollection(index_file.get_vocabulary())
+    for i in range(index_file.get_num_collections()):
+        data_collection.add_collection(IndexedDocColl(index_file, i, data_collection.get_vocabulary()))
+    return data_collection
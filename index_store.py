@@ -0,0 +1,289 @@
+'''Binary on-disk index of a parsed DataCollection.
+
+The index file stores the shared vocabulary and, for every BowDocColl, the
+docids, document lengths, the terms of each document (forward index) and
+the postings and highest term frequency of each term (inverted index), so
+a run can start from the index instead of reparsing the XML documents.
+
+Layout: an 8 byte magic string, the length of a JSON table of contents as
+an unsigned 64 bit integer, the table of contents, and then the raw arrays,
+each aligned to 8 bytes.  The table of contents records the offset, dtype
+and length of every array.  Postings are stored either as plain arrays or,
+with compression='bitpack', block-compressed by postings_codec.
+
+Build an index from the command line with
+
+    python index_store.py <coll-dir> <index-file> [bitpack]
+'''
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+import numpy as np
+from analyzer import Analyzer
+from bow__doc_coll import BowDocColl
+from compact_bow_doc import CompactBowDoc
+from data_collection import DataCollection
+from postings_codec import compress_postings
+from vocabulary import Vocabulary
+
+MAGIC = b'BOWINDX1'
+VERSION = 1
+COMPRESSIONS = (None, 'bitpack')
+
+
+class IndexWriter:
+    '''Accumulates arrays into an index file body and their table of contents.'''
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def add_array(self, values, dtype):
+        '''Append an array and return its table of contents entry.'''
+        data = np.ascontiguousarray(values, dtype=dtype).tobytes()
+        entry = {'offset': self.offset, 'dtype': np.dtype(dtype).str, 'length': len(data) // np.dtype(dtype).itemsize}
+        padding = -len(data) % 8
+        self.chunks.append(data + b'\0' * padding)
+        self.offset += len(data) + padding
+        return entry
+
+
+def collection_arrays(collection, vocabulary):
+    '''Get the forward and inverted index arrays of a BowDocColl.
+
+    Returns a dictionary of numpy arrays.  Documents keep the collection's
+    insertion order; postings refer to documents by that position (row).'''
+    docs = collection.get_docs()
+    docids = np.empty(len(docs), dtype=np.int64)
+    doc_lens = np.empty(len(docs), dtype=np.uint32)
+    doc_ptr = np.zeros(len(docs) + 1, dtype=np.uint64)
+    doc_terms = array('I')
+    doc_counts = array('I')
+    for row, (docid, doc) in enumerate(docs.items()):
+        #sorted by term id, the order CompactBowDoc keeps its terms in
+        term_id_freqs = sorted(doc.get_term_id_freqs(vocabulary))
+        for term_id, frequency in term_id_freqs:
+            doc_terms.append(term_id)
+            doc_counts.append(frequency)
+        docids[row] = docid
+        doc_lens[row] = doc.get_doc_len()
+        doc_ptr[row + 1] = doc_ptr[row] + len(term_id_freqs)
+    doc_terms = np.frombuffer(doc_terms, dtype=np.uint32)
+    doc_counts = np.frombuffer(doc_counts, dtype=np.uint32)
+
+    #postings are sorted by term id, then by row
+    rows = np.repeat(np.arange(len(docs), dtype=np.uint32), np.diff(doc_ptr).astype(np.int64))
+    order = np.lexsort((rows, doc_terms))
+    term_ids, term_counts = np.unique(doc_terms[order], return_counts=True)
+    term_ptr = np.zeros(len(term_ids) + 1, dtype=np.uint64)
+    np.cumsum(term_counts, out=term_ptr[1:])
+    post_tfs = doc_counts[order]
+    term_max_tfs = np.maximum.reduceat(post_tfs, term_ptr[:-1].astype(np.int64)) if len(term_ids) else post_tfs
+    return {
+        'docids': docids,
+        'doc_lens': doc_lens,
+        'doc_ptr': doc_ptr,
+        'doc_terms': doc_terms,
+        'doc_counts': doc_counts,
+        'term_ids': term_ids.astype(np.uint32),
+        'term_ptr': term_ptr,
+        'term_max_tfs': term_max_tfs.astype(np.uint32),
+        'post_rows': rows[order],
+        'post_tfs': post_tfs,
+    }
+
+
+def write_index(data_collection, index_path, compression=None, fingerprint=None):
+    '''Write a DataCollection to a binary index file.
+
+    compression is None for plain postings arrays or 'bitpack' for
+    block-compressed postings.  fingerprint is the Analyzer.get_fingerprint()
+    of the analyzer the documents were parsed with, checked by is_index_fresh.'''
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'Unknown postings compression {compression!r}')
+    vocabulary = data_collection.get_vocabulary()
+    writer = IndexWriter()
+    collections = []
+    for i in range(data_collection.get_num_collections()):
+        arrays = collection_arrays(data_collection.get_collection(i), vocabulary)
+        if compression == 'bitpack':
+            arrays.update(compress_postings(arrays['term_ptr'], arrays.pop('post_rows'), arrays.pop('post_tfs')))
+        collections.append({name: writer.add_array(values, values.dtype) for name, values in arrays.items()})
+    #terms are split on whitespace when parsed, so a newline can separate them
+    terms = np.frombuffer('\n'.join(vocabulary.terms).encode('utf-8'), dtype=np.uint8)
+    toc = {
+        'version': VERSION,
+        'compression': compression,
+        'fingerprint': fingerprint,
+        'num_terms': len(vocabulary),
+        'terms': writer.add_array(terms, np.uint8),
+        'collections': collections,
+    }
+    toc_data = json.dumps(toc).encode('utf-8')
+    header = MAGIC + struct.pack('<Q', len(toc_data)) + toc_data
+    header += b'\0' * (-len(header) % 8)
+
+    #write to a temporary file first so readers never see a partial index
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(header)
+        for chunk in writer.chunks:
+            file.write(chunk)
+    os.replace(tmp_path, index_path)
+
+
+class IndexFile:
+    '''A binary index file mapped into memory.
+
+    Arrays are numpy views on the mapped file, so nothing is copied until a
+    caller copies it.'''
+
+    def __init__(self, index_path):
+        with open(index_path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{index_path} is not an index file')
+        toc_len, = struct.unpack_from('<Q', self.buffer, len(MAGIC))
+        toc_start = len(MAGIC) + 8
+        self.toc = json.loads(self.buffer[toc_start:toc_start + toc_len].decode('utf-8'))
+        if self.toc['version'] != VERSION:
+            raise ValueError(f'{index_path} has unsupported index version {self.toc["version"]}')
+        header_len = toc_start + toc_len
+        self.body_offset = header_len + (-header_len % 8)
+
+    def get_array(self, entry):
+        '''Get a read-only numpy view of an array from its table of contents entry.'''
+        return np.frombuffer(self.buffer, dtype=np.dtype(entry['dtype']), count=entry['length'],
+                             offset=self.body_offset + entry['offset'])
+
+    def get_compression(self):
+        '''Get the postings compression of the index, None for plain arrays.'''
+        return self.toc.get('compression')
+
+    def get_fingerprint(self):
+        '''Get the fingerprint of the analyzer the index was built with, None if it was not recorded.'''
+        return self.toc.get('fingerprint')
+
+    def get_vocabulary(self):
+        '''Read the vocabulary stored in the index.'''
+        if self.toc['num_terms'] == 0:
+            return Vocabulary()
+        terms = self.get_array(self.toc['terms']).tobytes().decode('utf-8')
+        return Vocabulary.from_terms(terms.split('\n'))
+
+    def get_num_collections(self):
+        '''Get the number of BowDocColl objects stored in the index.'''
+        return len(self.toc['collections'])
+
+    def get_collection_arrays(self, index):
+        '''Get the arrays of a stored BowDocColl as a dictionary of numpy views.'''
+        return {name: self.get_array(entry) for name, entry in self.toc['collections'][index].items()}
+
+    def close(self):
+        '''Unmap the index file.
+
+        Will raise a BufferError while array views on the file are alive.'''
+        self.buffer.close()
+
+
+def read_collection_docs(index_file, position, vocabulary):
+    '''Yield the documents of a stored BowDocColl as CompactBowDoc objects.
+
+    The vocabulary must be the one stored in the index file, or one that
+    extends it.'''
+    arrays = index_file.get_collection_arrays(position)
+    doc_ptr = arrays['doc_ptr'].tolist()
+    doc_terms = arrays['doc_terms']
+    doc_counts = arrays['doc_counts']
+    for row, (docid, doc_len) in enumerate(zip(arrays['docids'].tolist(), arrays['doc_lens'].tolist())):
+        start, end = doc_ptr[row], doc_ptr[row + 1]
+        yield stored_doc(docid, vocabulary, doc_terms[start:end], doc_counts[start:end], doc_len)
+
+
+def stored_doc(docid, vocabulary, term_ids, counts, doc_len):
+    '''Build a CompactBowDoc from its slice of the forward index.
+
+    Index files written before the forward index was sorted by term id are
+    sorted here.'''
+    if len(term_ids) > 1 and (term_ids[1:] < term_ids[:-1]).any():
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, counts = term_ids[order], counts[order]
+    document = CompactBowDoc(docid, vocabulary)
+    document.term_ids.frombytes(term_ids.tobytes())
+    document.counts.frombytes(counts.tobytes())
+    document.set_doc_len(doc_len)
+    return document
+
+
+def read_index(index_path):
+    '''Load a binary index file into a DataCollection of CompactBowDoc documents.'''
+    index_file = IndexFile(index_path)
+    data_collection = DataCollection(index_file.get_vocabulary())
+    vocabulary = data_collection.get_vocabulary()
+    for i in range(index_file.get_num_collections()):
+        bow_doc_coll = BowDocColl(vocabulary)
+        for document in read_collection_docs(index_file, i, vocabulary):
+            bow_doc_coll.add_doc(document)
+        data_collection.add_collection(bow_doc_coll)
+    #the mapping is released once the last array view is garbage collected
+    return data_collection
+
+
+def get_source_mtime(inputpath):
+    '''Get the latest modification time of a collection folder, its sub-folders and their files.
+
+    For a corpus archive this is the modification time of the archive.'''
+    latest = os.stat(inputpath).st_mtime
+    if not os.path.isdir(inputpath):
+        return latest
+    for folder in os.scandir(inputpath):
+        latest = max(latest, folder.stat().st_mtime)
+        if folder.is_dir():
+            for file in os.scandir(folder.path):
+                latest = max(latest, file.stat().st_mtime)
+    return latest
+
+
+def is_index_fresh(index_path, inputpath, fingerprint=None):
+    '''Check whether an index file exists and is newer than the collection folder.
+
+    With an Analyzer.get_fingerprint(), the index must also have been built
+    with that fingerprint, so a change of stopwords or stemmer, such as a new
+    stem table, rebuilds it.'''
+    if not os.path.exists(index_path):
+        return False
+    if os.stat(index_path).st_mtime <= get_source_mtime(inputpath):
+        return False
+    if fingerprint is None:
+        return True
+    try:
+        index_file = IndexFile(index_path)
+    except ValueError:
+        return False
+    index_fingerprint = index_file.get_fingerprint()
+    index_file.close()
+    return index_fingerprint == fingerprint
+
+
+def build_index(stop_words, inputpath, index_path, compression=None):
+    '''Parse the documents in the given path and write them to an index file.
+
+    Returns the parsed DataCollection.'''
+    from parse import parse_documents
+    inputpath = os.path.abspath(inputpath)
+    index_path = os.path.abspath(index_path)
+    data_collection = parse_documents(stop_words, inputpath, compact=True)
+    write_index(data_collection, index_path, compression, Analyzer(stop_words).get_fingerprint())
+    return data_collection
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        sys.stderr.write("USAGE: %s <coll-dir> <index-file> [bitpack]\n" % sys.argv[0])
+        sys.exit()
+    from parse import get_stopwords
+    build_index(get_stopwords(), sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None)
+    print(f"Index written to {sys.argv[2]}")
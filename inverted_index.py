@@ -0,0 +1,87 @@
+class InvertedIndex:
+    """Inverted index over a collection of BOW documents.
+
+    Maps the id of every term in a Vocabulary to its postings, a dictionary
+    of docid:term frequency pairs.  The document frequency of a term is the
+    length of its postings.  The highest term frequency in the postings of
+    every term is kept up to date as documents are added and removed, as an
+    upper bound for pruned retrieval."""
+
+    def __init__(self, vocabulary):
+        """Constructor.
+
+        Creates an empty index whose term ids come from the given vocabulary.
+        Call add_doc to index documents."""
+        self.vocabulary = vocabulary
+        self.postings = {}
+        self.max_term_freqs = {}
+
+    def add_doc(self, doc):
+        """Add the terms of a document to the index."""
+        docid = doc.get_docid()
+        for term_id, frequency in doc.get_term_id_freqs(self.vocabulary):
+            try:
+                self.postings[term_id][docid] = frequency
+            except KeyError:
+                self.postings[term_id] = {docid: frequency}
+            if frequency > self.max_term_freqs.get(term_id, 0):
+                self.max_term_freqs[term_id] = frequency
+
+    def remove_doc(self, doc):
+        """Remove the terms of a document from the index.
+
+        Terms left without postings are dropped from the index."""
+        docid = doc.get_docid()
+        for term_id, _ in doc.get_term_id_freqs(self.vocabulary):
+            postings = self.postings.get(term_id)
+            if postings is None:
+                continue
+            frequency = postings.pop(docid, None)
+            if not postings:
+                del self.postings[term_id]
+                del self.max_term_freqs[term_id]
+            elif frequency == self.max_term_freqs[term_id]:
+                self.max_term_freqs[term_id] = max(postings.values())
+
+    def get_postings(self, term):
+        """Get the postings of a term.
+
+        Returns a dictionary with docids as keys and term frequencies as
+        values, or an empty dictionary if the term is not indexed."""
+        term_id = self.vocabulary.term_ids.get(term)
+        if term_id is None:
+            return {}
+        return self.postings.get(term_id, {})
+
+    def get_postings_by_id(self, term_id):
+        """Get the postings of a term by its id.
+
+        See get_postings."""
+        return self.postings.get(term_id, {})
+
+    def get_max_term_freq_by_id(self, term_id):
+        """Get the highest frequency of a term in any document, by term id.
+
+        Returns 0 if the term is not indexed."""
+        return self.max_term_freqs.get(term_id, 0)
+
+    def get_doc_freq(self, term):
+        """Get the number of documents containing a term."""
+        return len(self.get_postings(term))
+
+    def get_term_ids(self):
+        """Get sorted list of the ids of all indexed terms."""
+        return sorted(self.postings.keys())
+
+    def get_terms(self):
+        """Get sorted list of all indexed terms."""
+        terms = self.vocabulary.terms
+        return sorted(terms[term_id] for term_id in self.postings.keys())
+
+    def get_num_terms(self):
+        """Get the number of distinct terms in the index."""
+        return len(self.postings)
+
+    def __contains__(self, term):
+        """Check whether a term occurs in any indexed document."""
+        return bool(self.get_postings(term))
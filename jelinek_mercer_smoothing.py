@@ -1,6 +1,8 @@
 import os
+import numpy as np
 from bow__doc_coll import BowDocColl 
 from bow_query_coll import BowQueryColl
+from ranking import TOP_K, top_k, top_k_rows
 
 # """
 # Pseudocode
@@ -23,7 +25,8 @@ from bow_query_coll import BowQueryColl
 
 
 # Function to calculate the relevance score of a document using Jelinek-Mercer smoothing
-def jelinek_mercer_smoothing(query, collection_of_documents):
+# Returns the k best documents in ranking order, or all of them with k=None
+def jelinek_mercer_smoothing(query, collection_of_documents, k=None):
     #local variables
     lambda_ = 0.4
     epsilon = 1e-10  # small constant to avoid zero scores
@@ -31,8 +34,10 @@ def jelinek_mercer_smoothing(query, collection_of_documents):
     # a dictionary with document id as key and the score as value
     collection_score = {}
 
+    statistics = collection_of_documents.get_statistics()
+
     #total  number  of  word  occurrences  in  data  collection
-    total_words = (collection_of_documents.get_total_term_frequency())
+    total_words = statistics.get_total_term_frequency()
 
     #Calculate the score for the document
     for document in collection_of_documents.get_docs().values():
@@ -41,24 +46,52 @@ def jelinek_mercer_smoothing(query, collection_of_documents):
         ntqwd = 0.5
         for term in query.get_terms().keys(): 
              #number of times query word qi occurs in the data collection
-            try: 
-                ntqwc = collection_of_documents.get_collection_term_frequency()[term] 
-            except KeyError: 
-                ntqwc = 0
+            ntqwc = statistics.get_coll_freq(term)
             # number  of  times  query  word  qi occurs  in  document  D
             ntqwd = document.get_term_count(term)
             #the number of word occurrences in the document
-            doc_len = len(document.terms)
-            #calculate the score for the document
-            document_score = ((1-lambda_)*(ntqwd/doc_len)) + lambda_*(ntqwc/total_words)
+            doc_len = document.get_num_terms()
+            #calculate the score for the document, a document or collection without words adds nothing
+            doc_part = ntqwd/doc_len if doc_len else 0
+            coll_part = ntqwc/total_words if total_words else 0
+            document_score = ((1-lambda_)*doc_part) + lambda_*coll_part
             if document_score != 0:
                 score = score * (document_score + epsilon)
         collection_score[document.get_docid()] = score
-        #sort the collection_score by value in descending order
-        collection_score = dict(sorted(collection_score.items(), key=lambda x: x[1], reverse=True))
-    return collection_score
+    #rank the collection_score by value in descending order, once all documents are scored
+    return top_k(collection_score, k)
+
+
+
+
+# Vectorized jelinek_mercer_smoothing over the collection's term matrix.
+# Scores match jelinek_mercer_smoothing up to floating point rounding.
+def jelinek_mercer_smoothing_vectorized(query, collection_of_documents, k=None):
+    #local variables
+    lambda_ = 0.4
+    epsilon = 1e-10  # small constant to avoid zero scores
+
+    term_matrix = collection_of_documents.get_term_matrix()
+    term_ids, _ = term_matrix.query_arrays(query.get_term_ids(collection_of_documents.get_vocabulary()))
+
+    #total  number  of  word  occurrences  in  data  collection
+    total_words = term_matrix.coll_freq.sum()
+    #number of times each query word occurs in the data collection
+    ntqwc = term_matrix.coll_freq[term_ids]
+    # number  of  times  each query  word  occurs  in  each document, one row per document
+    ntqwd = term_matrix.get_columns(term_ids).toarray()
+    #the number of distinct words in each document
+    doc_len = term_matrix.num_doc_terms[:, np.newaxis]
 
+    #like jelinek_mercer_smoothing, a document or collection without words adds nothing
+    doc_part = np.divide(ntqwd, doc_len, out=np.zeros(ntqwd.shape), where=doc_len > 0)
+    coll_part = np.divide(ntqwc, total_words, out=np.zeros(ntqwc.shape), where=total_words > 0)
+    document_score = ((1-lambda_)*doc_part) + lambda_*coll_part
+    #query words that occur nowhere leave the score unchanged
+    scores = np.where(document_score != 0, document_score + epsilon, 1.0).prod(axis=1)
 
+    order = top_k_rows(scores, k)
+    return dict(zip(term_matrix.get_docids()[order].tolist(), scores[order].tolist()))
 
 
 # Main function that saves the rankings to an output file
@@ -74,12 +107,11 @@ def jm_lm(collections_of_queries, data_collection):
         output_file = os.path.join(os.getcwd(), f'JM_LM_R{query_position}Ranking.dat')
         #get the document collection
         collection_of_documents = data_collection.get_collection(document_collection_position)
-        rankings = jelinek_mercer_smoothing(query, collection_of_documents)
+        #only the first TOP_K documents are ranked and saved
+        rankings = jelinek_mercer_smoothing(query, collection_of_documents, TOP_K)
         #save the rankings to a file
         with open(output_file, 'w', encoding='utf-8') as out_file:
-            for i, (doc_id, score) in enumerate(rankings.items()):
-                if i >= 15:
-                    break
+            for doc_id, score in rankings.items():
                 out_file.write(f'{doc_id} {score}\n')
         document_collection_position += 1
         query_position += 1
@@ -3,8 +3,12 @@ import bm25
 import pandas as pd
 import sys
 import os
+from analyzer import Analyzer
 from parse import parse_query as pq, get_stopwords
 from parse import parse_documents as pdoc
+from index_store import write_index, is_index_fresh
+from index_reader import open_index
+from stem_table import StemTable
 from jelinek_mercer_smoothing import jm_lm
 from prm import retrieve_bm25, generate_w5_scores, create_prm_benchmark
 from evaluate import load_relevance_judgements, load_all_rankings, load_prm_rankings, evaluate_models_with_prm, perform_ttest
@@ -22,9 +26,22 @@ if __name__ == '__main__':
     # Define the query file
     query_file = 'the50Queries.txt'
 
-    # Parse queries and documents
-    collection_of_queries = pq(get_stopwords(), query_file)
-    data_collection = pdoc(get_stopwords(), inputpath)
+    # Look stems up in the stem table of the data if one was built with stem_table.py, otherwise stem as we go
+    stem_table_path = inputpath.rstrip(os.sep) + '.stems'
+    stemmer = StemTable(stem_table_path) if os.path.exists(stem_table_path) else None
+
+    # Load the documents from the index if it is newer than the data and was built with the same stopwords
+    # and stemmer, otherwise parse them and rebuild the index
+    index_path = inputpath.rstrip(os.sep) + '.idx'
+    fingerprint = Analyzer(get_stopwords(), stemmer).get_fingerprint()
+    if is_index_fresh(index_path, inputpath, fingerprint):
+        data_collection = open_index(index_path)
+    else:
+        data_collection = pdoc(get_stopwords(), inputpath, compact=True, workers=os.cpu_count() or 1, stemmer=stemmer)
+        write_index(data_collection, index_path, fingerprint=fingerprint)
+
+    # Parse queries against the vocabulary of the documents
+    collection_of_queries = pq(get_stopwords(), query_file, data_collection.get_vocabulary(), stemmer)
 
     #Calculate BM25 scores
     perform_bm25(collection_of_queries, data_collection)
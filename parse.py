@@ -1,6 +1,13 @@
-import os, string, glob
-from stemming.porter2 import stem
+import os, glob, io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from xml.etree import ElementTree
+from analyzer import Analyzer
+from archive_source import CorpusArchive, ZipMember, is_archive, open_zip_member
+from parse_cache import ParseCache
 from bow_doc import BowDoc
+from compact_bow_doc import CompactBowDoc
 from bow__doc_coll import BowDocColl
 from bow_query_coll import BowQueryColl
 from bow_query import BowQuery
@@ -15,52 +22,319 @@ def get_stopwords():
     return stop_words
 
 
-def parse_documents(stop_words, inputpath):
-    '''Parse the documents in the given path and return the collection of documents.'''
+def open_source(source):
+    '''Open a document source as a binary file.
+
+    A source is the path of a file, the bytes of a file, or a ZipMember of
+    a zip archive.'''
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if isinstance(source, ZipMember):
+        return open_zip_member(source)
+    return open(source, 'rb')
+
+
+def parse_document_file(stop_words, source, stemmer=None, analyzer=None):
+    '''Parse one XML newsitem file and return it as a BowDoc.
+
+    The source is anything open_source accepts, usually a file path.  The text is analyzed by the given Analyzer, or by one built from the
+    stopwords and stemmer (the cached Porter2 stemmer if none is given).'''
+    if analyzer is None:
+        analyzer = Analyzer(stop_words, stemmer)
+    text_lines = []
+    document = BowDoc(docid=0)    #Initializing a document object for the current file
+    start_end = False                           #Variable to signal the end of the document id section
+    with io.TextIOWrapper(open_source(source), encoding='utf-8') as file:
+        for line in file:                     #iterate through each line within the list
+            line=line.strip()                       #remove the \n tags in the list
+            if(start_end == False):
+                if line.startswith("<newsitem "):
+                    for part in line.split():
+                        if part.startswith("itemid="):
+                            document.docid = int(part.split("=")[1].split("\"")[1])      #get the document id and store it as an attribute for the document object
+                            break 
+                if line.startswith("<text>"):
+                    start_end = True
+            elif line.startswith("</text>"):
+                break
+            else:
+                text_lines.append(line)
+    #analyze the whole text at once; a word is a sequence of characters terminated by a whitespace or punctuation
+    text = '\n'.join(text_lines).replace("<p>", "").replace("</p>", "")
+    term_counts, doc_len = analyzer.analyze(text)
+    document.add_term_counts(term_counts)
+    #set the doc_len of the document object
+    document.set_doc_len(doc_len)
+    return document
+
+
+def parse_document_file_xml(stop_words, source, stemmer=None, analyzer=None):
+    '''Parse one XML newsitem file with ElementTree.iterparse and return it as a BowDoc.
+
+    The source is anything open_source accepts.  Reads the itemid attribute and the text of the <text> element, which is
+    analyzed like in parse_document_file.  Unlike the line parser, this one
+    follows the encoding declared in the file, decodes entities such as
+    &amp; instead of indexing their names, and finds attributes wherever
+    the tag is broken across lines.  Reading stops at </text>.'''
+    if analyzer is None:
+        analyzer = Analyzer(stop_words, stemmer)
+    document = BowDoc(docid=0)
+    text = ''
+    with open_source(source) as file:
+        for event, element in ElementTree.iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == 'newsitem':
+                    document.docid = int(element.get('itemid'))
+            elif element.tag == 'text':
+                #the text between the tags, including the line breaks between paragraphs
+                text = ''.join(element.itertext())
+                element.clear()
+                break
+    term_counts, doc_len = analyzer.analyze(text)
+    document.add_term_counts(term_counts)
+    document.set_doc_len(doc_len)
+    return document
+
+
+#document parser backends, selected by name
+PARSERS = {
+    'lines': parse_document_file,
+    'xml': parse_document_file_xml,
+}
+
+
+def get_document_parser(parser):
+    '''Get a document parser backend by name, one of the keys of PARSERS.'''
+    try:
+        return PARSERS[parser]
+    except KeyError:
+        raise ValueError(f'Unknown document parser {parser!r}, expected one of {", ".join(PARSERS)}') from None
+
+
+def parse_document_files(stop_words, sources, stemmer=None, analyzer=None, parser='lines'):
+    '''Parse a list of XML newsitem files and return a list of BowDoc objects.
+
+    Takes file paths, or any other sources open_source accepts.'''
+    if analyzer is None:
+        analyzer = Analyzer(stop_words, stemmer)
+    parse_file = get_document_parser(parser)
+    return [parse_file(stop_words, source, analyzer=analyzer) for source in sources]
+
+
+#the Analyzer of a worker process, set once by init_parse_worker
+worker_analyzer = None
+
+
+def init_parse_worker(analyzer):
+    '''Keep the Analyzer of a worker process, so it is not sent with every chunk.'''
+    global worker_analyzer
+    worker_analyzer = analyzer
+
+
+def parse_chunk_files(stop_words, sources, analyzer=None, parser='lines'):
+    '''Parse a chunk of sources in a worker process.
+
+    Uses the given analyzer, or the one init_parse_worker kept.  Returns the
+    list of BowDoc objects and the (hits, misses) the analyzer's stemmer
+    counted parsing them, or None if the stemmer does not take them back
+    with add_counts.'''
+    if analyzer is None:
+        analyzer = worker_analyzer
+    stemmer = analyzer.get_stemmer()
+    if not hasattr(stemmer, 'add_counts'):
+        return parse_document_files(stop_words, sources, analyzer=analyzer, parser=parser), None
+    hits, misses = stemmer.get_hits(), stemmer.get_misses()
+    documents = parse_document_files(stop_words, sources, analyzer=analyzer, parser=parser)
+    return documents, (stemmer.get_hits() - hits, stemmer.get_misses() - misses)
+
+
+def list_collection_files(inputpath):
+    '''List the XML files of every collection folder in the given path.
+
+    Returns a list of (folder name, list of absolute file paths) tuples, in
+    directory listing order.  Entries of the path that are not folders are
+    skipped.'''
+    inputpath = os.path.abspath(inputpath)
+    collections = []
+    for folder in os.listdir(inputpath):
+        folder_path = os.path.join(inputpath, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        collections.append((folder, glob.glob(os.path.join(glob.escape(folder_path), '*.xml'))))
+    return collections
+
+
+def iter_folder_sources(collection_files):
+    '''Yield the files listed by list_collection_files as (collection id, path, size) tuples.'''
+    for position, (_, file_paths) in enumerate(collection_files):
+        for file_path in file_paths:
+            yield position, file_path, os.path.getsize(file_path)
+
+
+def open_parse_cache(cache_path, stop_words, stemmer=None, parser='lines'):
+    '''Open a ParseCache for documents parsed with the given stopwords, stemmer and parser backend.'''
+    fingerprint = Analyzer(stop_words, stemmer).get_fingerprint()
+    return ParseCache(cache_path, f'{parser}:{fingerprint}')
+
+
+def iter_source_documents(stop_words, sources, workers=1, chunk_size=64, memory_limit=64 << 20, stemmer=None,
+                          parser='lines', cache=None):
+    '''Parse a stream of documents one at a time.
+
+    Takes an iterable of (collection id, source, size in bytes) tuples, as
+    made by iter_folder_sources or CorpusArchive.iter_sources.  A generator
+    of (collection id, BowDoc) tuples in the order of the sources.
+
+    With workers > 1 the sources are parsed in chunks of chunk_size by a
+    pool of that many processes.  Chunks are only handed to the pool while
+    the sources of the chunks not yet consumed take less than memory_limit
+    bytes, so a slow consumer holds the parsers back instead of letting
+    parsed documents pile up.  The analyzer, with a given stemmer, is copied
+    to each worker once when the pool starts, and each copy keeps its own
+    cache.  A stemmer with add_counts, such as a StemTable, gets the hits
+    and misses of its copies added back.  parser selects the document
+    parser backend, see PARSERS.  With a ParseCache
+    from open_parse_cache, only sources missing from the cache are parsed.'''
+    if cache is not None:
+        yield from cache.iter_documents(sources, partial(iter_source_documents, stop_words, workers=workers,
+                                                         chunk_size=chunk_size, memory_limit=memory_limit,
+                                                         stemmer=stemmer, parser=parser))
+        return
+    analyzer = Analyzer(stop_words, stemmer)
+    parse_file = get_document_parser(parser)
+    if workers <= 1:
+        for position, source, _ in sources:
+            yield position, parse_file(stop_words, source, analyzer=analyzer)
+        return
+
+    def iter_chunks():
+        '''Group the sources into (collection ids, sources, size) chunks.'''
+        positions, chunk, size = [], [], 0
+        for position, source, source_size in sources:
+            positions.append(position)
+            chunk.append(source)
+            size += source_size
+            if len(chunk) == chunk_size:
+                yield positions, chunk, size
+                positions, chunk, size = [], [], 0
+        if chunk:
+            yield positions, chunk, size
+
+    parse_chunk = partial(parse_chunk_files, stop_words, parser=parser)
+    stemmer = analyzer.get_stemmer()
+
+    def chunk_documents(future):
+        '''Get the documents of a parsed chunk, counting its stemmer hits and misses.'''
+        documents, counts = future.result()
+        if counts is not None:
+            stemmer.add_counts(*counts)
+        return documents
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_parse_worker, initargs=(analyzer,)) as executor:
+        pending = deque()                           #(collection ids, source bytes, future) in submission order
+        pending_bytes = 0
+        for positions, chunk, size in iter_chunks():
+            #always keep one chunk in flight, however large it is
+            while pending and pending_bytes + size > memory_limit:
+                done_positions, done_size, future = pending.popleft()
+                pending_bytes -= done_size
+                yield from zip(done_positions, chunk_documents(future))
+            pending.append((positions, size, executor.submit(parse_chunk, chunk)))
+            pending_bytes += size
+        while pending:
+            done_positions, _, future = pending.popleft()
+            yield from zip(done_positions, chunk_documents(future))
+
+
+def iter_collection_documents(stop_words, collection_files, workers=1, chunk_size=64, memory_limit=64 << 20,
+                              stemmer=None, parser='lines', cache=None):
+    '''Parse the files listed by list_collection_files one at a time.
+
+    A generator of (collection id, BowDoc) tuples in folder and file order,
+    where the collection id is the position of the folder in the list.  See
+    iter_source_documents for the other arguments.'''
+    return iter_source_documents(stop_words, iter_folder_sources(collection_files), workers, chunk_size,
+                                 memory_limit, stemmer, parser, cache)
+
+
+def iter_documents(stop_words, inputpath, workers=1, chunk_size=64, memory_limit=64 << 20, stemmer=None,
+                   parser='lines', cache=None):
+    '''Parse the documents in the given path one at a time.
+
+    The path is a folder of collection folders, or a zip or tar archive of
+    them.  A generator of (collection id, BowDoc) tuples, where the
+    collection id is the position of the document's collection, as in the
+    DataCollection parse_documents returns.  Only the documents being parsed
+    are held in memory; see iter_source_documents for workers, chunk_size,
+    memory_limit, stemmer, parser and cache.'''
+    if is_archive(inputpath):
+        #members must be read here to be looked up in a cache
+        sources = CorpusArchive(inputpath).iter_sources(decompress_in_workers=workers > 1 and cache is None)
+        return iter_source_documents(stop_words, sources, workers, chunk_size, memory_limit, stemmer, parser, cache)
+    return iter_collection_documents(stop_words, list_collection_files(inputpath), workers, chunk_size, memory_limit,
+                                     stemmer, parser, cache)
+
+
+def parse_documents(stop_words, inputpath, compact=False, vocabulary=None, workers=1, chunk_size=64, stemmer=None,
+                    parser='lines', cache_path=None):
+    '''Parse the documents in the given path and return the collection of documents.
+
+    The path is a folder of collection folders, or a zip or tar archive of
+    them whose top-level directories are the collections.  All collections share the vocabulary of the returned DataCollection, which
+    is the given vocabulary if any.  With compact=True every document is
+    stored as a CompactBowDoc against that vocabulary.
+
+    With workers > 1 the files are parsed in chunks of chunk_size files by a
+    pool of that many processes.  Documents are still added, and terms given
+    their ids, in folder and file order, so the result is identical to a
+    serial parse.  Terms are stemmed with the given stemmer, or the cached
+    Porter2 stemmer of the analyzer module.  parser selects the document
+    parser backend: 'lines' (the default) or 'xml', see PARSERS.
+
+    With a cache_path, parsed documents are kept in a ParseCache file there
+    and files that did not change since an earlier run are not parsed
+    again; the cache hits and misses are printed at the end, as are those
+    of a stemmer with a report, such as a StemTable.'''
     print("Parsing documents...")
-    data_collection = DataCollection()                            #Create an instance of the BowColl class
-    #local variables
-    os.chdir(inputpath) 
+    data_collection = DataCollection(vocabulary)                  #Create an instance of the BowColl class
+    vocabulary = data_collection.get_vocabulary()
+    cache = open_parse_cache(cache_path, stop_words, stemmer, parser) if cache_path is not None else None
     print('New collection')                          
-    for folder in os.listdir(): 
-        os.chdir( os.getcwd() + f'/{folder}')
-        bow_doc_coll = BowDocColl()                 
-        for file in glob.glob('*.xml'):                 #Iterate through all files with .xml
-            document = BowDoc(docid=0)    #Initializing a document object for the current file
-            start_end = False                           #Variable to signal the end of the document id section
-            for line in open(file, encoding='utf-8'):                     #iterate through each line within the list
-                line=line.strip()                       #remove the \n tags in the list
-                if(start_end == False):
-                    if line.startswith("<newsitem "):
-                        for part in line.split():
-                            if part.startswith("itemid="):
-                                document.docid = int(part.split("=")[1].split("\"")[1])      #get the document id and store it as an attribute for the document object
-                                break 
-                    if line.startswith("<text>"):
-                        start_end = True
-                elif line.startswith("</text>"):
-                    break
-                else:
-                    line = line.replace("<p>", "").replace("</p>", "")
-                    line = line.translate(str.maketrans('','', string.digits)).translate(str.maketrans(string.punctuation, ' '*len(string.punctuation)))
-                    line = line.replace("\\s+", " ")
-                    for term in line.split():                      #I split the line into words. A word is a sequence of characters terminated by a whitespace or punctuation.
-                        document.doc_len = document.doc_len + 1
-                        term = stem(term.lower())
-                        if len(term) > 2 and term not in stop_words: 
-                            document.add_term(term) 
-            #add document to the collection object Bowcoll
-            bow_doc_coll.add_doc(document) 
-            #set the doc_len of the document object
-            document.set_doc_len(document.doc_len)
-        data_collection.add_collection(bow_doc_coll)
-        os.chdir('..')
-
-    os.chdir('..')
+    if is_archive(inputpath):
+        #collections are found while the archive is read
+        documents = iter_documents(stop_words, inputpath, workers, chunk_size, stemmer=stemmer, parser=parser,
+                                   cache=cache)
+    else:
+        collection_files = list_collection_files(inputpath)
+        #every folder gets a collection, even one without XML files
+        for _ in collection_files:
+            data_collection.add_collection(BowDocColl(vocabulary))
+        documents = iter_collection_documents(stop_words, collection_files, workers, chunk_size, stemmer=stemmer,
+                                              parser=parser, cache=cache)
+
+    for position, document in documents:
+        if compact:
+            document = CompactBowDoc.from_bow_doc(document, vocabulary)
+        while data_collection.get_num_collections() <= position:
+            data_collection.add_collection(BowDocColl(vocabulary))
+        #add document to the collection object Bowcoll
+        data_collection.get_collection(position).add_doc(document)
+
+    if cache is not None:
+        print(cache.get_report())
+        cache.close()
+    if hasattr(stemmer, 'get_report'):
+        print(stemmer.get_report())
     return data_collection
 
-def parse_query(stop_words, query_file):
-    """Parse a query into a query object then add it to the collection"""
+def parse_query(stop_words, query_file, vocabulary=None, stemmer=None):
+    """Parse a query into a query object then add it to the collection
+
+    If a vocabulary is given, the query terms are added to it so that they
+    share term ids with the documents parsed against the same vocabulary.
+    Titles are analyzed like documents, with the given stemmer or the cached
+    Porter2 stemmer."""
+    analyzer = Analyzer(stop_words, stemmer)
     query_coll = BowQueryColl()
     with open(query_file, 'r', encoding='utf-8') as file:
         content = file.read().split('</Query>')
@@ -95,12 +369,11 @@ def parse_query(stop_words, query_file):
                 query_coll.add_query(query)
                 #take the query text and store as query_text variable for parsing
                 query_text = query.get_query_title()
-                query_text = query_text.translate(str.maketrans('','', string.digits)).translate(str.maketrans(string.punctuation, ' '*len(string.punctuation)))
-                query_text = query_text.replace("\\s+", " ")
-                for term in query_text.split():                      
-                    term = stem(term.lower())
-                    if len(term) > 2 and term not in stop_words:
-                        query.add_term(term)
+                term_counts = analyzer.get_term_counts(query_text)
+                query.add_term_counts(term_counts)
+                if vocabulary is not None:
+                    for term in term_counts:
+                        vocabulary.add_term(term)
 
     
     return query_coll
\ No newline at end of file
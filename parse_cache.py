@@ -0,0 +1,161 @@
+'''Cache of parsed documents, so unchanged XML files are not tokenized again.
+
+A ParseCache is an SQLite file holding, for every parsed file, its path,
+modification time, size and SHA-1 digest together with the docid, length
+and term counts of its BowDoc.  A file whose modification time and size
+match is a hit without being read; otherwise its digest is compared, so a
+touched but unchanged file is still a hit.  Sources without a path, such
+as archive members, are keyed by their digest.
+
+The cache also stores a fingerprint of the analyzer and document parser
+it was filled with, and starts empty when that fingerprint changes.  The
+entry of a file that changed is dropped when the file is looked up, and
+entries of files that no longer exist are dropped when the cache is opened.'''
+import hashlib
+import os
+import sqlite3
+from array import array
+from collections import deque
+from bow_doc import BowDoc
+
+CACHE_VERSION = 1
+
+
+class ParseCache:
+    '''Parsed documents by file path and content digest, stored in SQLite.'''
+
+    def __init__(self, cache_path, fingerprint):
+        '''Constructor.
+
+        Takes the path of the cache file, which is created if it does not
+        exist, and the fingerprint of the analyzer and parser the documents
+        are parsed with.'''
+        self.cache_path = cache_path
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS docs (path TEXT PRIMARY KEY, mtime_ns INTEGER, '
+                                'size INTEGER, sha1 TEXT, docid INTEGER, doc_len INTEGER, terms TEXT, counts BLOB)')
+        fingerprint = f'{CACHE_VERSION}:{fingerprint}'
+        stored = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if stored is None or stored[0] != fingerprint:
+            self.connection.execute('DELETE FROM docs')
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self.hits = 0
+        self.misses = 0
+        self.pruned = self.prune()
+        self.connection.commit()
+
+    def prune(self):
+        '''Delete the entries of files that no longer exist.
+
+        Returns the number of entries deleted.'''
+        paths = [row[0] for row in self.connection.execute("SELECT path FROM docs WHERE path NOT LIKE 'sha1:%'")]
+        missing = [(path,) for path in paths if not os.path.exists(path)]
+        self.connection.executemany('DELETE FROM docs WHERE path = ?', missing)
+        return len(missing)
+
+    def lookup(self, source):
+        '''Look up a document source.
+
+        Returns a (key, hit, source) tuple.  key identifies the cache entry
+        of the source and is None if the source cannot be cached; hit says
+        whether the entry holds the parsed document; source is what to parse
+        on a miss, the bytes of the file if they had to be read.'''
+        if isinstance(source, bytes):
+            key = ('sha1:' + hashlib.sha1(source).hexdigest(), 0, len(source), None)
+            row = self.connection.execute('SELECT 1 FROM docs WHERE path = ?', key[:1]).fetchone()
+            return key, row is not None, source
+        if not isinstance(source, str):
+            return None, False, source
+
+        stat = os.stat(source)
+        row = self.connection.execute('SELECT mtime_ns, size, sha1 FROM docs WHERE path = ?', (source,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return (source, stat.st_mtime_ns, stat.st_size, row[2]), True, source
+        with open(source, 'rb') as file:
+            data = file.read()
+        digest = hashlib.sha1(data).hexdigest()
+        key = (source, stat.st_mtime_ns, stat.st_size, digest)
+        if row is not None and row[2] == digest:
+            self.connection.execute('UPDATE docs SET mtime_ns = ?, size = ? WHERE path = ?',
+                                    (stat.st_mtime_ns, stat.st_size, source))
+            return key, True, source
+        if row is not None:
+            #the file changed, so its entry is stale whether or not it is parsed again
+            self.connection.execute('DELETE FROM docs WHERE path = ?', (source,))
+        return key, False, data
+
+    def get_document(self, key):
+        '''Build the cached BowDoc of a cache key.'''
+        docid, doc_len, terms, counts = self.connection.execute(
+            'SELECT docid, doc_len, terms, counts FROM docs WHERE path = ?', key[:1]).fetchone()
+        document = BowDoc(docid)
+        if terms:
+            document.terms = dict(zip(terms.split('\n'), array('I', counts)))
+        document.set_doc_len(doc_len)
+        return document
+
+    def put_document(self, key, document):
+        '''Store the parsed BowDoc of a cache key.'''
+        term_freqs = document.get_term_freq_dict()
+        self.connection.execute('INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                key + (document.get_docid(), document.get_doc_len(), '\n'.join(term_freqs),
+                                       array('I', term_freqs.values()).tobytes()))
+
+    def iter_documents(self, sources, parse_sources):
+        '''Yield (collection id, BowDoc) tuples for a stream of sources, parsing only the misses.
+
+        Takes (collection id, source, size) tuples and a function that parses
+        a stream of such tuples into (collection id, BowDoc) tuples in order,
+        such as iter_source_documents.  Documents come out in the order of
+        the sources; parsed documents are added to the cache.'''
+        #(collection id, key, hit) of every source looked up but not yet yielded, in order
+        order = deque()
+
+        def iter_misses():
+            for position, source, size in sources:
+                key, hit, source = self.lookup(source)
+                order.append((position, key, hit))
+                if not hit:
+                    yield position, source, size
+
+        for position, document in parse_sources(iter_misses()):
+            #sources are looked up in order, so every hit before this document is already known
+            while order[0][2]:
+                hit_position, key, _ = order.popleft()
+                self.hits += 1
+                yield hit_position, self.get_document(key)
+            _, key, _ = order.popleft()
+            self.misses += 1
+            if key is not None:
+                self.put_document(key, document)
+            yield position, document
+        while order:
+            hit_position, key, _ = order.popleft()
+            self.hits += 1
+            yield hit_position, self.get_document(key)
+        self.connection.commit()
+
+    def get_hits(self):
+        '''Get the number of documents taken from the cache.'''
+        return self.hits
+
+    def get_misses(self):
+        '''Get the number of documents that had to be parsed.'''
+        return self.misses
+
+    def get_pruned(self):
+        '''Get the number of entries of missing files deleted when the cache was opened.'''
+        return self.pruned
+
+    def get_report(self):
+        '''Get a one-line summary of the cache hits, misses and pruned entries.'''
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f'Parse cache: {self.hits} hits, {self.misses} misses ({rate:.1%} of {total} documents reused), '
+                f'{self.pruned} stale entries removed')
+
+    def close(self):
+        '''Commit and close the cache file.'''
+        self.connection.commit()
+        self.connection.close()
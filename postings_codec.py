@@ -0,0 +1,138 @@
+'''Block-wise compression of postings lists.
+
+A postings list of ascending document rows and their term frequencies is cut
+into blocks of BLOCK_SIZE postings.  Within a block, rows are stored as gaps
+from the previous row (the first gap of a term is taken from -1), and term
+frequencies as tf - 1.  Each of the two sequences is bit-packed with the
+smallest fixed bit width that fits its largest value, so a block of
+postings that all have tf 1 stores no term frequency bits at all.
+
+Packing works on whole blocks and unpacking on all blocks of a term at
+once with numpy, without a Python loop over postings.'''
+import numpy as np
+
+BLOCK_SIZE = 128
+
+
+def pack_bits(values, width):
+    '''Pack unsigned integers into a little-endian bit string of fixed width.
+
+    Returns a uint8 array of ceil(len(values) * width / 8) bytes, the
+    inverse of unpack_fields.'''
+    if width == 0 or len(values) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    shifts = np.arange(width, dtype=np.uint64)
+    bits = (np.asarray(values, dtype=np.uint64)[:, np.newaxis] >> shifts) & 1
+    return np.packbits(bits.astype(np.uint8).ravel(), bitorder='little')
+
+
+def unpack_fields(bits, starts, widths):
+    '''Unpack unsigned integers of varying bit widths from an array of bits.
+
+    Takes the bits as unpacked by np.unpackbits in little-endian bit order,
+    and the bit offset and width of every integer.  Returns an int64 array.'''
+    max_width = int(widths.max()) if len(widths) else 0
+    if max_width == 0:
+        return np.zeros(len(starts), dtype=np.int64)
+    shifts = np.arange(max_width, dtype=np.int64)
+    in_field = shifts < widths[:, np.newaxis]
+    positions = np.where(in_field, starts[:, np.newaxis] + shifts, 0)
+    return (bits[positions] & in_field).astype(np.int64) @ (np.int64(1) << shifts)
+
+
+def packed_size(count, width):
+    '''Get the number of bytes pack_bits uses for count values of a bit width.'''
+    return (count * width + 7) // 8
+
+
+def encode_postings(rows, tfs):
+    '''Compress the postings of one term.
+
+    Takes ascending document rows and their term frequencies.  Returns a
+    (data, block sizes, row widths, tf widths) tuple: the packed bytes of all
+    blocks, and for every block its size in bytes and the bit widths of its
+    row gaps and term frequencies.'''
+    rows = np.asarray(rows, dtype=np.int64)
+    tfs = np.asarray(tfs, dtype=np.int64)
+    gaps = np.diff(rows, prepend=-1)
+    chunks = []
+    block_sizes = []
+    row_widths = []
+    tf_widths = []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block_gaps = gaps[start:start + BLOCK_SIZE]
+        block_tfs = tfs[start:start + BLOCK_SIZE] - 1
+        row_width = int(block_gaps.max()).bit_length()
+        tf_width = int(block_tfs.max()).bit_length()
+        chunk = np.concatenate((pack_bits(block_gaps, row_width), pack_bits(block_tfs, tf_width)))
+        chunks.append(chunk)
+        block_sizes.append(len(chunk))
+        row_widths.append(row_width)
+        tf_widths.append(tf_width)
+    data = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+    return data, block_sizes, row_widths, tf_widths
+
+
+def decode_postings(data, block_ptr, row_widths, tf_widths, num_postings):
+    '''Decode the blocks of one term.
+
+    Takes the packed bytes of the index, the byte offsets of the term's
+    blocks plus the end offset of its last block, the bit widths of the
+    blocks, and the number of postings of the term.  Returns a (rows, tfs)
+    tuple of int64 arrays.
+
+    The bytes of all blocks are unpacked to bits at once, and every posting
+    reads its row gap and term frequency at the offset given by its block
+    and its place in the block.'''
+    if num_postings == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    block_ptr = np.asarray(block_ptr, dtype=np.int64)
+    row_widths = np.asarray(row_widths, dtype=np.int64)
+    tf_widths = np.asarray(tf_widths, dtype=np.int64)
+    num_blocks = len(block_ptr) - 1
+    block_starts = np.arange(num_blocks, dtype=np.int64) * BLOCK_SIZE
+    counts = np.minimum(BLOCK_SIZE, num_postings - block_starts)
+    bits = np.unpackbits(data[block_ptr[0]:block_ptr[-1]], bitorder='little')
+    #bit offsets of the row gaps and term frequencies of every block
+    row_bits = (block_ptr[:-1] - block_ptr[0]) * 8
+    tf_bits = row_bits + packed_size(counts, row_widths) * 8
+
+    blocks = np.repeat(np.arange(num_blocks), counts)
+    places = np.arange(num_postings, dtype=np.int64) - block_starts[blocks]
+    gaps = unpack_fields(bits, row_bits[blocks] + places * row_widths[blocks], row_widths[blocks])
+    tfs = unpack_fields(bits, tf_bits[blocks] + places * tf_widths[blocks], tf_widths[blocks]) + 1
+    #the first gap of a term is taken from -1, and gaps run on across blocks
+    return np.cumsum(gaps) - 1, tfs
+
+
+def compress_postings(term_ptr, post_rows, post_tfs):
+    '''Compress the postings arrays of a collection.
+
+    Takes the postings pointer of every term and the concatenated rows and
+    term frequencies.  Returns a dictionary of arrays: the packed bytes
+    ('post_data'), the byte offset of every block plus the end offset
+    ('block_ptr'), the bit widths of every block ('row_widths', 'tf_widths'),
+    and the index of the first block of every term plus the total number of
+    blocks ('term_block_ptr').'''
+    chunks = []
+    block_sizes = []
+    row_widths = []
+    tf_widths = []
+    term_block_ptr = [0]
+    for term in range(len(term_ptr) - 1):
+        start, end = int(term_ptr[term]), int(term_ptr[term + 1])
+        data, sizes, term_row_widths, term_tf_widths = encode_postings(post_rows[start:end], post_tfs[start:end])
+        chunks.append(data)
+        block_sizes.extend(sizes)
+        row_widths.extend(term_row_widths)
+        tf_widths.extend(term_tf_widths)
+        term_block_ptr.append(len(block_sizes))
+    block_ptr = np.zeros(len(block_sizes) + 1, dtype=np.uint64)
+    np.cumsum(block_sizes, out=block_ptr[1:])
+    return {
+        'post_data': np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8),
+        'block_ptr': block_ptr,
+        'row_widths': np.array(row_widths, dtype=np.uint8),
+        'tf_widths': np.array(tf_widths, dtype=np.uint8),
+        'term_block_ptr': np.array(term_block_ptr, dtype=np.uint64),
+    }
@@ -1,5 +1,7 @@
 import os
-from bm25 import my_bm25
+import numpy as np
+from bm25 import BM25Scorer
+from ranking import top_k
 
 
 
@@ -17,8 +19,8 @@ def retrieve_bm25(collection_of_queries, data_collection):
         output_file = os.path.join(os.getcwd(), f'PRM_R{query_position}.dat')
         #get the document collection
         collection_of_documents = data_collection.get_collection(document_collection_position)
-        #get the document frequency which is a dictionary with term as key and term frequency as value
-        rankings =my_bm25(collection_of_documents, query)
+        #the full ranking, every document is PRM input
+        rankings = BM25Scorer(collection_of_documents).score(query)
         #save the rankings to a file
         with open(output_file, 'w', encoding='utf-8') as out_file:
             for doc_id, score in rankings.items():
@@ -95,14 +97,8 @@ def calculate_w5(collection_of_documents,theta, i):
             except KeyError:
                 T[term] = 1
 
-    #calculate document frequency of all terms in the collection of documents
-    ntk ={} 
-    for doc in collection_of_documents.get_docs().values():
-        for term in doc.get_term_freq_dict().keys():
-            try:
-                ntk[term] += 1
-            except KeyError:
-                ntk[term] = 1
+    #document frequency of all terms in the collection of documents
+    ntk = collection_of_documents.get_statistics().get_doc_freq_dict()
     
     #get number of documents in the collection
     No_docs = collection_of_documents.get_num_docs()
@@ -134,7 +130,7 @@ def generate_w5_scores (collection_of_documents):
         ranks = BM25Testing(collection_of_documents.get_collection(i), features)
 
         # Sort the features by score in descending order
-        sorted_features = dict(sorted(features.items(), key=lambda item: item[1], reverse=True))
+        sorted_features = top_k(features)
 
         # Get the current working directory
         cwd = os.getcwd()
@@ -158,7 +154,7 @@ def generate_w5_scores (collection_of_documents):
         
 
         # Sort the features by score in descending order
-        sorted_ranks = dict(sorted(ranks.items(), key=lambda item: item[1], reverse=True))
+        sorted_ranks = top_k(ranks)
 
 
         # Define the directory path relative to the current working directory
@@ -179,16 +175,31 @@ def generate_w5_scores (collection_of_documents):
 
 
 def BM25Testing(coll, features):
-    ranks={}
-    for id, doc in coll.get_docs().items():
-        Rank = 0
-        for term in features.keys():
-            if term in doc.get_term_list():
-                try:
-                    ranks[id] += features[term]
-                except KeyError:
-                    ranks[id] = features[term]
-    return ranks
+    '''Rank the documents of a collection by the summed weights of the feature terms they contain.
+
+    Only documents containing at least one feature term get a rank.  See
+    bm25_testing_vectorized.'''
+    return bm25_testing_vectorized(coll, features)
+
+def bm25_testing_vectorized(coll, features):
+    '''BM25Testing over the columns of the collection's term matrix.
+
+    The weight of each feature term is added to the rows of its postings in
+    feature order, so the ranks are the same floats as a loop over the
+    documents adding the weights of the features they contain.'''
+    term_matrix = coll.get_term_matrix()
+    columns = term_matrix.columns
+    term_ids = coll.get_vocabulary().term_ids
+    ranks = np.zeros(term_matrix.get_num_docs())
+    matched = np.zeros(term_matrix.get_num_docs(), dtype=bool)
+    for term, weight in features.items():
+        term_id = term_ids.get(term)
+        if term_id is None or term_id >= term_matrix.get_num_terms():
+            continue
+        rows = columns.indices[columns.indptr[term_id]:columns.indptr[term_id + 1]]
+        ranks[rows] += weight
+        matched[rows] = True
+    return term_matrix.to_score_dict(ranks, matched)
     
 
 
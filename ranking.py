@@ -0,0 +1,64 @@
+'''Top-k selection of ranked documents, shared by all rankers.
+
+Every ranker orders documents by descending score, ties in collection
+order, which is the order of dict(sorted(scores.items(), key=score,
+reverse=True)).  top_k and top_k_rows select the first k documents of that
+order without sorting the whole collection; with k=None they return the
+full ranking, for callers such as the PRM input that need every document.'''
+import heapq
+import numpy as np
+
+#number of documents written to the ranking files of each query
+TOP_K = 15
+
+
+def top_k(doc_scores, k=None):
+    '''Get the k highest scoring documents of a docid:score dictionary.
+
+    Returns a docid:score dictionary in ranking order, ties in the order of
+    the given dictionary.  With k=None all documents are ranked.'''
+    if k is None or k >= len(doc_scores):
+        return dict(sorted(doc_scores.items(), key=lambda item: item[1], reverse=True))
+    #nlargest is documented to equal sorted(..., reverse=True)[:k], ties included
+    return dict(heapq.nlargest(k, doc_scores.items(), key=lambda item: item[1]))
+
+
+def top_k_rows(scores, k=None):
+    '''Get the rows of the k highest scores of an array, in ranking order.
+
+    Ties are ranked by row, like top_k ranks them by dictionary order.  With
+    k=None all rows are ranked.'''
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    #the k-th highest score; every row above it is in, rows equal to it fill up by row order.
+    #Selecting near the start of the negated scores stays fast when most scores are equal
+    threshold = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > threshold)
+    tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+    rows = np.sort(np.concatenate((above, tied)))
+    return rows[np.argsort(-scores[rows], kind='stable')]
+
+
+def top_k_matrix_rows(scores, k=None):
+    '''Get top_k_rows of every row of a 2-D array, selected for all rows at once.
+
+    Returns a list with the array of column indices of each row.'''
+    num_rows, num_columns = scores.shape
+    if k is None or k >= num_columns:
+        return list(np.argsort(-scores, axis=1, kind='stable'))
+    if k <= 0:
+        return [np.zeros(0, dtype=np.int64) for _ in range(num_rows)]
+    thresholds = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+    above_rows, above_columns = np.divmod(np.flatnonzero(scores > thresholds[:, None]), num_columns)
+    #ties fill each row up to k by column, flatnonzero lists them by row, then column
+    tied_rows, tied_columns = np.divmod(np.flatnonzero(scores == thresholds[:, None]), num_columns)
+    needed = k - np.bincount(above_rows, minlength=num_rows)
+    tied_starts = np.searchsorted(tied_rows, np.arange(num_rows))
+    tied = np.arange(len(tied_rows)) - tied_starts[tied_rows] < needed[tied_rows]
+    rows = np.concatenate((above_rows, tied_rows[tied]))
+    columns = np.concatenate((above_columns, tied_columns[tied]))
+    #k entries per row, ranked by row, then score, then column
+    order = np.lexsort((columns, -scores[rows, columns], rows))
+    return list(columns[order].reshape(num_rows, k))
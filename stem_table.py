@@ -0,0 +1,256 @@
+'''Precomputed stem table of a collection's vocabulary.
+
+A stem table file holds every distinct token of a collection with its stem,
+as made by one of the stemmers of the stemming package, so a run can look
+stems up instead of stemming the same vocabulary again.  StemTable maps
+the file into memory and looks words up in place; words missing from the
+table are stemmed by the stemmer the table was built with.
+
+Layout: an 8 byte magic string, the number of words, the number of hash
+slots and the length of the stemmer name as little-endian unsigned 32 bit
+integers, the stemmer name padded to 4 bytes, the word offsets and stem
+offsets (each one more than the number of words, unsigned 32 bit), the hash
+slots (unsigned 32 bit), and then the UTF-8 words and stems.  Words are
+sorted by their UTF-8 bytes.  The hash slots are an open addressing table
+on the CRC-32 of the words, holding one more than the position of a word,
+or 0 for an empty slot; there are at least twice as many as words.
+
+Build a stem table from the command line with
+
+    python stem_table.py <coll-dir> <table-file> [stemmer]
+'''
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from stemming import batch
+from stemming.cache import CachingStemmer, get_stem_function
+
+MAGIC = b'STEMTBL1'
+HEADER = struct.Struct('<8sIII')
+DEFAULT_STEMMER = 'porter2_fast'
+
+
+def offsets_array(values):
+    '''Get a list of offsets as little-endian unsigned 32 bit bytes.'''
+    offsets = array('I', values)
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    return offsets.tobytes()
+
+
+def write_stem_table(table_path, stemmer_name, words, workers=1):
+    '''Stem the distinct words of an iterable with a named stemmer and write them to a stem table file.
+
+    Words the stemmer raises an error on are left out, so they are stemmed,
+    and raise, when looked up.  Returns the number of words written.'''
+    stem = get_stem_function(stemmer_name)
+    stems = {}
+    words = list(dict.fromkeys(words))
+    try:
+        stems = batch.stem_unique(stem, words, workers, stemmer_name)
+    except Exception:
+        #stem one at a time to find the words that fail
+        for word in words:
+            try:
+                stems[word] = stem(word)
+            except Exception:
+                pass
+    entries = sorted((word.encode('utf-8'), stemmed.encode('utf-8')) for word, stemmed in stems.items())
+    word_offsets, stem_offsets = [0], [0]
+    for word, stemmed in entries:
+        word_offsets.append(word_offsets[-1] + len(word))
+        stem_offsets.append(stem_offsets[-1] + len(stemmed))
+    num_slots = 1
+    while num_slots < 2 * len(entries):
+        num_slots *= 2
+    slots = [0] * num_slots
+    for position, (word, _) in enumerate(entries):
+        slot = zlib.crc32(word) & (num_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (num_slots - 1)
+        slots[slot] = position + 1
+    name = stemmer_name.encode('ascii')
+    with open(table_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(entries), num_slots, len(name)))
+        file.write(name + b'\0' * (-len(name) % 4))
+        file.write(offsets_array(word_offsets))
+        file.write(offsets_array(stem_offsets))
+        file.write(offsets_array(slots))
+        file.write(b''.join(word for word, _ in entries))
+        file.write(b''.join(stemmed for _, stemmed in entries))
+    return len(entries)
+
+
+class StemTable:
+    '''Stemmer that looks stems up in a memory-mapped stem table file.
+
+    Offers the stem and stem_many methods of CachingStemmer.  Words missing
+    from the table are stemmed, and cached, by the stemmer the table was
+    built with; get_report tells how many lookups the table answered.'''
+
+    def __init__(self, table_path):
+        '''Constructor.
+
+        Maps the stem table file; nothing is read until words are looked up.'''
+        self.table_path = table_path
+        with open(table_path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, num_slots, name_length = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f'{table_path} is not a stem table')
+        self.name = bytes(self.data[HEADER.size:HEADER.size + name_length]).decode('ascii')
+        start = HEADER.size + name_length + (-name_length % 4)
+        size = 4 * (count + 1)
+        view = memoryview(self.data)
+        self.count = count
+        self.word_offsets = self.read_offsets(view[start:start + size])
+        self.stem_offsets = self.read_offsets(view[start + size:start + 2 * size])
+        self.slots = self.read_offsets(view[start + 2 * size:start + 2 * size + 4 * num_slots])
+        self.mask = num_slots - 1
+        self.words_start = start + 2 * size + 4 * num_slots
+        self.stems_start = self.words_start + self.word_offsets[count]
+        #words missing from the table, and the function the analyzer fingerprint names
+        self.fallback = CachingStemmer(get_stem_function(self.name))
+        self.stem_function = self.fallback.stem_function
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def read_offsets(view):
+        '''Get offsets stored by offsets_array, without copying on little-endian machines.'''
+        if sys.byteorder == 'big':
+            offsets = array('I', view)
+            offsets.byteswap()
+            return offsets
+        return view.cast('I')
+
+    def __getstate__(self):
+        #worker processes map the file again instead of receiving its contents
+        return {'table_path': self.table_path}
+
+    def __setstate__(self, state):
+        self.__init__(state['table_path'])
+
+    def lookup(self, word):
+        '''Get the stem of a word from the table, or None if the word is not in it.'''
+        key = word.encode('utf-8')
+        data, slots, mask = self.data, self.slots, self.mask
+        word_offsets, words_start = self.word_offsets, self.words_start
+        slot = zlib.crc32(key) & mask
+        position = slots[slot]
+        while position:
+            position -= 1
+            if data[words_start + word_offsets[position]:words_start + word_offsets[position + 1]] == key:
+                start = self.stems_start
+                return data[start + self.stem_offsets[position]:start + self.stem_offsets[position + 1]].decode('utf-8')
+            slot = (slot + 1) & mask
+            position = slots[slot]
+        return None
+
+    def stem(self, word):
+        '''Returns the stemmed version of the argument string.'''
+        stemmed = self.lookup(word)
+        if stemmed is not None:
+            self.hits += 1
+            return stemmed
+        self.misses += 1
+        return self.fallback.stem(word)
+
+    __call__ = stem
+
+    def stem_many(self, words, workers=1):
+        '''Returns the stemmed versions of an iterable of words, in input order.
+
+        Each distinct word counts as one hit or miss; the misses are stemmed
+        in one batch by the fallback stemmer.'''
+        words = list(words)
+        table = {}
+        missing = []
+        for word in dict.fromkeys(words):
+            stemmed = self.lookup(word)
+            if stemmed is None:
+                missing.append(word)
+            else:
+                table[word] = stemmed
+        self.hits += len(table)
+        self.misses += len(missing)
+        if missing:
+            table.update(zip(missing, self.fallback.stem_many(missing, workers)))
+        return [table[word] for word in words]
+
+    def get_name(self):
+        '''Get the name of the stemmer the table was built with.'''
+        return self.name
+
+    def __len__(self):
+        return self.count
+
+    def get_hits(self):
+        '''Get the number of words found in the table.'''
+        return self.hits
+
+    def get_misses(self):
+        '''Get the number of words that had to be stemmed.'''
+        return self.misses
+
+    def get_hit_rate(self):
+        '''Get the fraction of words found in the table, 0 before any lookup.'''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def add_counts(self, hits, misses):
+        '''Add the hits and misses counted by a copy of this table in a worker process.'''
+        self.hits += hits
+        self.misses += misses
+
+    def get_report(self):
+        '''Get a one-line summary of the table hits and misses.'''
+        total = self.hits + self.misses
+        return (f'Stem table: {self.hits} hits, {self.misses} misses '
+                f'({self.get_hit_rate():.1%} of {total} words from {len(self)} {self.name} stems)')
+
+    def close(self):
+        '''Unmap the stem table file.'''
+        self.word_offsets = self.stem_offsets = self.slots = None
+        self.data.close()
+
+
+class NoStemmer:
+    '''Stemmer that keeps every word as it is, for collecting the tokens of a collection.'''
+
+    def stem(self, word):
+        return word
+
+
+def build_stem_table(inputpath, table_path, stemmer_name=DEFAULT_STEMMER, workers=1, parser='lines'):
+    '''Write a stem table of the tokens of the documents in the given path.
+
+    The path is a folder of collection folders or an archive of them, as
+    for parse.iter_documents.  The documents are parsed without stemming,
+    stopwords or a minimum length to collect every distinct token the
+    analyzer would stem; workers > 1 stems them in that many processes.
+    Returns the number of words written.'''
+    from analyzer import Analyzer
+    from archive_source import CorpusArchive, is_archive
+    from parse import get_document_parser, iter_folder_sources, list_collection_files
+    get_stem_function(stemmer_name)                 #fail on an unknown stemmer before parsing
+    analyzer = Analyzer([], NoStemmer(), min_length=0)
+    parse_file = get_document_parser(parser)
+    if is_archive(inputpath):
+        sources = CorpusArchive(inputpath).iter_sources()
+    else:
+        sources = iter_folder_sources(list_collection_files(inputpath))
+    vocabulary = {}
+    for _, source, _ in sources:
+        vocabulary.update(dict.fromkeys(parse_file([], source, analyzer=analyzer).get_term_freq_dict()))
+    return write_stem_table(table_path, stemmer_name, vocabulary, workers)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        sys.stderr.write("USAGE: %s <coll-dir> <table-file> [stemmer]\n" % sys.argv[0])
+        sys.exit()
+    count = build_stem_table(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else DEFAULT_STEMMER)
+    print(f"{count} stems written to {sys.argv[2]}")
@@ -0,0 +1,50 @@
+"""This module stems many words at once. Every distinct word is stemmed
+only once, and the stems are mapped back to the input order::
+
+    from stemming.porter2 import stem_many
+    stemmed_words = stem_many(words)
+
+Each stemmer module of this package has its own ``stem_many()``, which calls
+the function here with its ``stem()``.  Large vocabularies can be stemmed
+across a pool of processes with ``workers``; each worker process imports the
+stemmer by name, so nothing but the words is sent to it.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import importlib
+
+
+def stem_words(name, words):
+    """Returns the stems of a list of words, stemmed with the ``stem()``
+    function of the named stemmer module.
+    """
+    stem = importlib.import_module("stemming." + name).stem
+    return [stem(word) for word in words]
+
+
+def stem_unique(stem, words, workers=1, name=None, chunk_size=5000):
+    """Returns a dictionary of word:stem pairs for an iterable of words.
+
+    With a stemmer module name and workers > 1, vocabularies of more than
+    chunk_size distinct words are stemmed in chunks by a pool of that many
+    processes.
+    """
+    unique = list(dict.fromkeys(words))
+    if workers > 1 and name is not None and len(unique) > chunk_size:
+        chunks = [unique[start:start + chunk_size] for start in range(0, len(unique), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            stems = [stemmed for part in executor.map(partial(stem_words, name), chunks) for stemmed in part]
+    else:
+        stems = [stem(word) for word in unique]
+    return dict(zip(unique, stems))
+
+
+def stem_many(stem, words, workers=1, name=None, chunk_size=5000):
+    """Returns the list of stems of an iterable of words, in input order.
+
+    See ``stem_unique()`` for workers, name and chunk_size.
+    """
+    words = list(words)
+    table = stem_unique(stem, words, workers, name, chunk_size)
+    return [table[word] for word in words]
@@ -0,0 +1,144 @@
+"""This module wraps any of the stemmers of this package in a size-bounded
+cache, so a word that occurs many times is only stemmed once::
+
+    from stemming.porter2 import stem
+    stemmer = CachingStemmer(stem)
+    stemmed_word = stemmer.stem(word)
+
+The least recently used words are dropped once the cache holds max_size
+words.  A stem table saved with ``save_table()`` can be loaded into a new
+stemmer to start with a warm cache::
+
+    stemmer = CachingStemmer(stem, table_path="stems.tsv")
+
+A stem table is a UTF-8 text file with one tab-separated word and stem per
+line.
+"""
+
+from collections import OrderedDict
+import importlib
+from stemming import batch
+
+
+STEMMERS = ("porter", "porter2", "porter2_fast", "lovins", "paicehusk")
+
+
+def get_stem_function(name):
+    """Returns the ``stem()`` function of one of the stemmers of this package.
+    """
+    if name not in STEMMERS:
+        raise ValueError("Unknown stemmer %r, expected one of %s" % (name, ", ".join(STEMMERS)))
+    return importlib.import_module("stemming." + name).stem
+
+
+class CachingStemmer(object):
+    """Stems words with a stem function, remembering the most recent results.
+    """
+
+    def __init__(self, stem_function, max_size=100000, table_path=None):
+        self.stem_function = stem_function
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # the stemmer name lets stem_many hand misses to worker processes
+        self.name = None
+        # only the module's own stem(), a stemmer with other rules must stem in-process
+        module = getattr(stem_function, "__module__", None) or ""
+        candidate = module[len("stemming."):]
+        if module.startswith("stemming.") and candidate in STEMMERS and stem_function is get_stem_function(candidate):
+            self.name = candidate
+        if table_path is not None:
+            self.load_table(table_path)
+
+    def stem(self, word):
+        """Returns the stemmed version of the argument string.
+        """
+        cache = self.cache
+        stemmed = cache.get(word)
+        if stemmed is not None:
+            self.hits += 1
+            cache.move_to_end(word)
+            return stemmed
+        self.misses += 1
+        stemmed = self.stem_function(word)
+        cache[word] = stemmed
+        if len(cache) > self.max_size:
+            cache.popitem(last=False)
+        return stemmed
+
+    __call__ = stem
+
+    def stem_many(self, words, workers=1):
+        """Returns the stemmed versions of an iterable of words, in input order.
+
+        Each distinct word counts as one hit or miss.  The misses are stemmed
+        in one batch, across worker processes if workers > 1 and the stem
+        function is one of this package's.
+        """
+        words = list(words)
+        cache = self.cache
+        table = {}
+        missing = []
+        for word in dict.fromkeys(words):
+            stemmed = cache.get(word)
+            if stemmed is None:
+                missing.append(word)
+            else:
+                cache.move_to_end(word)
+                table[word] = stemmed
+        self.hits += len(table)
+        self.misses += len(missing)
+        if missing:
+            stemmed_missing = batch.stem_unique(self.stem_function, missing, workers, self.name)
+            cache.update(stemmed_missing)
+            while len(cache) > self.max_size:
+                cache.popitem(last=False)
+            table.update(stemmed_missing)
+        return [table[word] for word in words]
+
+    def get_hits(self):
+        """Returns the number of words found in the cache.
+        """
+        return self.hits
+
+    def get_misses(self):
+        """Returns the number of words that had to be stemmed.
+        """
+        return self.misses
+
+    def get_hit_rate(self):
+        """Returns the fraction of words found in the cache, 0 before any lookup.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Empties the cache and resets the counters.
+        """
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def load_table(self, table_path):
+        """Adds the words of a saved stem table to the cache.
+
+        Later lines count as more recently used.  Only the last max_size
+        words of the table are kept.
+        """
+        with open(table_path, "r", encoding="utf-8") as table:
+            for line in table:
+                word, _, stemmed = line.rstrip("\n").partition("\t")
+                if word:
+                    self.cache[word] = stemmed
+                    self.cache.move_to_end(word)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def save_table(self, table_path):
+        """Writes the cached words and their stems to a stem table,
+        least recently used first.
+        """
+        with open(table_path, "w", encoding="utf-8") as table:
+            for word, stemmed in self.cache.items():
+                table.write("%s\t%s\n" % (word, stemmed))
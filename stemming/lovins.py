@@ -5,6 +5,7 @@ function::
 """
 
 from collections import defaultdict
+from stemming import batch
 
 
 # Conditions
@@ -539,4 +540,9 @@ def stem(word):
     return fix_ending(remove_ending(word))
 
 
+def stem_many(words, workers=1):
+    """Returns the stemmed versions of an iterable of words, in input order.
 
+    Every distinct word is stemmed once; see stemming.batch for workers.
+    """
+    return batch.stem_many(stem, words, workers, name="lovins")
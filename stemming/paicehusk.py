@@ -12,10 +12,18 @@ then use the object's stem method to stem words::
 
     stemmer = PaiceHuskStemmer(my_rules_string)
     stemmed_word = stemmer.stem(word)
+
+``CompiledPaiceHuskStemmer`` takes the same rule string and gives exactly the
+same stems, faster: it looks up the rules matching a word by its ending in
+precomputed tables instead of testing every rule.  The module's ``stem()``
+uses it::
+
+    stemmer = CompiledPaiceHuskStemmer(my_rules_string)
 """
 
 import re
 from collections import defaultdict
+from stemming import batch
 
 
 class PaiceHuskStemmer(object):
@@ -32,6 +40,9 @@ class PaiceHuskStemmer(object):
     
     stem_expr = re.compile("^\w+", re.UNICODE)
     
+    prefixes = ("kilo", "micro", "milli", "intra", "ultra", "mega", "nano",
+                "pico", "pseudo")
+    
     def __init__(self, ruletable):
         """
         :param ruletable: a string containing the rule data, separated
@@ -71,8 +82,7 @@ class PaiceHuskStemmer(object):
         return vp
 
     def strip_prefix(self, word):
-        for prefix in ("kilo", "micro", "milli", "intra", "ultra", "mega",
-                       "nano", "pico", "pseudo"):
+        for prefix in self.prefixes:
             if word.startswith(prefix):
                 return word[len(prefix):]
         return word
@@ -114,6 +124,114 @@ class PaiceHuskStemmer(object):
         
         return stem
 
+
+class CompiledPaiceHuskStemmer(PaiceHuskStemmer):
+    """Implements the Paice-Husk stemming algorithm with precomputed rule
+    dispatch. Gives exactly the same stems as ``PaiceHuskStemmer``, and
+    raises the same errors.
+    """
+    
+    vowel_expr = re.compile("[aeiou]")
+    # number of words whose prefix decision is remembered before starting over
+    prefix_cache_size = 1 << 16
+    
+    def __init__(self, ruletable):
+        PaiceHuskStemmer.__init__(self, ruletable)
+        self.compile_rules()
+        self.prefix_cuts = {}
+    
+    def compile_rules(self):
+        """Precomputes the rule tables ``stem()`` works with.
+
+        For every last character, the endings of its rules are kept in a
+        dictionary, looked up longest first.  Each ending maps to the rules
+        whose endings are suffixes of it, in rule table order: once the
+        longest matching ending is found, those are exactly the rules that
+        match, in the order ``PaiceHuskStemmer.stem()`` tries them.
+        """
+        self.compiled_rules = {}
+        for lastchar, rulelist in self.rules.items():
+            endings = {}
+            for ending, _, _, _, _ in rulelist:
+                endings[ending] = [rule for rule in rulelist
+                                   if ending.endswith(rule[0])]
+            lengths = sorted(set(len(ending) for ending in endings),
+                             reverse=True)
+            self.compiled_rules[lastchar] = (lengths, endings)
+        # alternatives are tried in order, like the prefixes in strip_prefix()
+        self.prefix_expr = re.compile("|".join(self.prefixes))
+    
+    def strip_prefix(self, word):
+        """Returns the word without its prefix, remembering the length of
+        the prefix stripped from each word.
+        """
+        try:
+            cut = self.prefix_cuts[word]
+        except KeyError:
+            match = self.prefix_expr.match(word)
+            cut = match.end() if match else 0
+            if len(self.prefix_cuts) >= self.prefix_cache_size:
+                self.prefix_cuts.clear()
+            self.prefix_cuts[word] = cut
+        return word[cut:] if cut else word
+    
+    def stem(self, word):
+        """Returns a stemmed version of the argument string.
+
+        The positions of the first vowel and the first y are updated as
+        endings are replaced instead of searched for on every round.
+        """
+        match = self.stem_expr.match(word)
+        if not match: return word
+        stem = self.strip_prefix(match.group(0))
+        compiled_rules = self.compiled_rules
+        vowel_expr = self.vowel_expr
+        
+        # first a, e, i, o or u and first y of the stem, or -1
+        match = vowel_expr.search(stem)
+        vp = match.start() if match else -1
+        yp = stem.find("y")
+        is_intact = True
+        continuing = True
+        while continuing:
+            if vp < 0:
+                # as first_vowel() does for a stem without vowels
+                raise ValueError("min() arg is an empty sequence")
+            pfv = yp if 0 < yp < vp else vp
+            compiled = compiled_rules.get(stem[-1])
+            if not compiled: break
+            
+            continuing = False
+            lengths, endings = compiled
+            size = len(stem)
+            rulelist = ()
+            for length in lengths:
+                if length <= size and stem[size - length:] in endings:
+                    rulelist = endings[stem[size - length:]]
+                    break
+            for ending, intact, num, append, cont in rulelist:
+                if intact and not is_intact: continue
+                newlen = size - num + len(append)
+                if (pfv == 0 and newlen < 2) or (pfv > 0 and newlen < 3):
+                    continue
+                
+                is_intact = False
+                # stem[:0-num] keeps nothing when num is 0
+                keep = max(size - num, 0) if num else 0
+                stem = stem[:keep] + append
+                if vp >= keep:
+                    match = vowel_expr.search(append)
+                    vp = match.start() + keep if match else -1
+                if yp < 0 or yp >= keep:
+                    yp = append.find("y")
+                    yp = yp + keep if yp >= 0 else -1
+                
+                continuing = cont
+                break
+        
+        return stem
+
+
 # The default rules for the Paice-Husk stemming algorithm
 
 defaultrules = """
@@ -236,11 +354,12 @@ zy1s.     { -yz > -ys  }
 
 # Make the standard rules available as a module-level function
 
-stem = PaiceHuskStemmer(defaultrules).stem
-
-
-
-
+stem = CompiledPaiceHuskStemmer(defaultrules).stem
 
 
+def stem_many(words, workers=1):
+    """Returns the stemmed versions of an iterable of words, in input order.
 
+    Every distinct word is stemmed once; see stemming.batch for workers.
+    """
+    return batch.stem_many(stem, words, workers, name="paicehusk")
@@ -8,6 +8,7 @@ seriously weird Python linked from the official page.
 """
 
 import re
+from stemming import batch
 
 # Suffix replacement lists
 
@@ -172,17 +173,14 @@ def stem(w):
 
     return w
 
-if __name__ == '__main__':
-    print stem("fundamentally")
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
 
+def stem_many(words, workers=1):
+    """Returns the stemmed versions of an iterable of words, in input order.
+
+    Every distinct word is stemmed once; see stemming.batch for workers.
+    """
+    return batch.stem_many(stem, words, workers, name="porter")
+
+
+if __name__ == '__main__':
+    print(stem("fundamentally"))
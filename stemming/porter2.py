@@ -9,6 +9,7 @@ in stemming.porter.
 """
 
 import re
+from stemming import batch
  
 r_exp = re.compile(r"[^aeiouy]*[aeiouy]+[^aeiouy](\w*)")
 ewss_exp1 = re.compile(r"^[aeiouy][^aeiouy]$")
@@ -281,4 +282,10 @@ def stem(word):
 
     return word
 
- 
+
+def stem_many(words, workers=1):
+    """Returns the stemmed versions of an iterable of words, in input order.
+
+    Every distinct word is stemmed once; see stemming.batch for workers.
+    """
+    return batch.stem_many(stem, words, workers, name="porter2")
@@ -0,0 +1,201 @@
+"""A faster implementation of the Porter2 stemming algorithm, giving exactly
+the same stems as ``stemming.porter2``::
+
+    from stemming.porter2_fast import stem
+    stemmed_word = stem(word)
+
+The suffix rules of steps 1b to 4 are compiled into dictionaries keyed by
+their last two letters, so each step looks up the few suffixes that can
+match the end of the word and takes the longest one, instead of testing
+every candidate suffix in turn.  R1 and R2 are computed once per word, and
+the vowel tests are set operations rather than regular expressions.  In
+each rule list of ``stemming.porter2``, a suffix that is also the end of a
+later suffix always comes after it, so the longest match is the rule the
+original applies.
+"""
+
+from stemming import batch
+from stemming.porter2 import (r_exp, ccy_exp, doubles, s2_triples, s3_triples, s4_delete_list,
+                              exceptional_forms, exceptional_early_exit_post_1a)
+
+VOWELS = frozenset("aeiouy")
+DOUBLES = frozenset(doubles)
+# the last letter of a short syllable may not be a vowel, w, x or Y
+NOT_SHORT_END = frozenset("aeiouywxY")
+
+
+def compile_rules(rules):
+    """Returns a suffix:rule dictionary and a dictionary from the last two
+    letters of the suffixes to the suffixes ending with them, longest first,
+    from a sequence of rules whose first element is the suffix.
+    """
+    table = {}
+    for rule in rules:
+        table.setdefault(rule[0], rule[1:])
+    tails = {}
+    for suffix in sorted(table, key=len, reverse=True):
+        tails.setdefault(suffix[-2:], []).append(suffix)
+    return table, tails
+
+
+# step 2: suffix -> (replacement, letters that must precede it or None)
+STEP2, STEP2_TAILS = compile_rules([(end, repl, tuple(prev) or None) for end, repl, prev in s2_triples])
+# step 3: suffix -> (replacement, whether the suffix must be in R2)
+STEP3, STEP3_TAILS = compile_rules(s3_triples)
+# step 4: suffixes deleted when in R2
+STEP4, STEP4_TAILS = compile_rules([(end,) for end in s4_delete_list])
+# step 1b: suffixes deleted when a vowel precedes them
+STEP1B, STEP1B_TAILS = compile_rules([(end,) for end in ("ed", "edly", "ing", "ingly")])
+
+
+def longest_suffix(word, tails):
+    """Returns the longest suffix of word among the suffixes of a tails
+    dictionary made by compile_rules, or None.
+    """
+    for suffix in tails.get(word[-2:], ()):
+        if word.endswith(suffix):
+            return suffix
+    return None
+
+
+def get_r1(word):
+    """Returns the start of region R1 of a word.
+    """
+    if word.startswith("gener") or word.startswith("arsen"):
+        return 5
+    if word.startswith("commun"):
+        return 6
+    match = r_exp.match(word)
+    if match:
+        return match.start(1)
+    return len(word)
+
+
+def ends_with_short_syllable(word):
+    """Checks whether a word ends with a short syllable.
+    """
+    n = len(word)
+    if n == 2 and word[0] in VOWELS and word[1] not in VOWELS:
+        return True
+    return (n >= 3 and word[-1] not in NOT_SHORT_END and word[-2] in VOWELS
+            and word[-3] not in VOWELS)
+
+
+def stem(word):
+    """Returns the stemmed version of the argument string.
+    """
+    if len(word) <= 2:
+        return word
+    if word[0] == "'":
+        word = word[1:]
+
+    # handle some exceptional forms
+    stemmed = exceptional_forms.get(word)
+    if stemmed is not None:
+        return stemmed
+
+    if "y" in word:
+        if word[0] == "y":
+            word = "Y" + word[1:]
+        word = ccy_exp.sub("\\g<1>Y", word)
+
+    # R1 and R2, computed once
+    r1 = get_r1(word)
+    match = r_exp.match(word, r1)
+    r2 = match.start(1) if match else len(word)
+
+    # step 0
+    if word.endswith("'"):
+        if word.endswith("'s'"):
+            word = word[:-3]
+        else:
+            word = word[:-1]
+    elif word.endswith("'s"):
+        word = word[:-2]
+
+    # step 1a
+    if word.endswith("s"):
+        if word.endswith("sses"):
+            word = word[:-2]
+        elif word.endswith("ies"):
+            word = word[:-3] + ("i" if len(word) > 4 else "ie")
+        elif not (word.endswith("us") or word.endswith("ss")):
+            if not VOWELS.isdisjoint(word[:-2]):
+                word = word[:-1]
+    elif word.endswith("ied"):
+        word = word[:-3] + ("i" if len(word) > 4 else "ie")
+
+    # handle some more exceptional forms
+    if word in exceptional_early_exit_post_1a:
+        return word
+
+    # step 1b
+    if word.endswith("eedly"):
+        if len(word) - 5 >= r1:
+            word = word[:-3]
+    elif word.endswith("eed"):
+        if len(word) - 3 >= r1:
+            word = word[:-1]
+    else:
+        suffix = longest_suffix(word, STEP1B_TAILS)
+        if suffix is not None:
+            preceding = word[:-len(suffix)]
+            if not VOWELS.isdisjoint(preceding):
+                if preceding[-2:] in ("at", "bl", "iz"):
+                    word = preceding + "e"
+                elif preceding[-2:] in DOUBLES:
+                    word = preceding[:-1]
+                elif ends_with_short_syllable(preceding) and get_r1(preceding) == len(preceding):
+                    word = preceding + "e"
+                else:
+                    word = preceding
+
+    # step 1c
+    if word.endswith("y") or word.endswith("Y"):
+        if word[-2] not in VOWELS:
+            if len(word) > 2:
+                word = word[:-1] + "i"
+
+    # step 2
+    suffix = longest_suffix(word, STEP2_TAILS)
+    if suffix is not None and len(word) - len(suffix) >= r1:
+        repl, prev = STEP2[suffix]
+        base = word[:-len(suffix)]
+        if prev is None or base[-1:] in prev:
+            word = base + repl
+
+    # step 3
+    suffix = longest_suffix(word, STEP3_TAILS)
+    if suffix is not None and len(word) - len(suffix) >= r1:
+        repl, r2_necessary = STEP3[suffix]
+        if not r2_necessary or len(word) - len(suffix) >= r2:
+            word = word[:-len(suffix)] + repl
+
+    # step 4
+    suffix = longest_suffix(word, STEP4_TAILS)
+    if suffix is not None:
+        if len(word) - len(suffix) >= r2:
+            word = word[:-len(suffix)]
+    elif word.endswith("sion") or word.endswith("tion"):
+        if len(word) - 3 >= r2:
+            word = word[:-3]
+
+    # step 5
+    if word.endswith("l"):
+        if len(word) - 1 >= r2 and word[-2] == "l":
+            word = word[:-1]
+    elif word.endswith("e"):
+        if len(word) - 1 >= r2:
+            word = word[:-1]
+        elif len(word) - 1 >= r1 and not ends_with_short_syllable(word[:-1]):
+            word = word[:-1]
+
+    return word.replace("Y", "y")
+
+
+def stem_many(words, workers=1):
+    """Returns the stemmed versions of an iterable of words, in input order.
+
+    Every distinct word is stemmed once; see stemming.batch for workers.
+    """
+    return batch.stem_many(stem, words, workers, name="porter2_fast")
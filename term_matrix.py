@@ -0,0 +1,97 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class TermMatrix:
+    """Sparse document-term matrix of a collection of BOW documents.
+
+    Rows are the documents in the collection's insertion order, columns are
+    the term ids of the collection's vocabulary at the time the matrix was
+    built.  Alongside the CSR matrix of term counts the object keeps the
+    docid and document length of every row, and the document and collection
+    frequency of every column."""
+
+    def __init__(self, counts, term_ids, indptr, docids, doc_lens, num_terms):
+        """Constructor.
+
+        Takes the matrix in CSR form (term counts, their term ids, and row
+        pointers), the docid and length of every row, and the number of
+        columns.  Use from_collection to build the matrix of a collection."""
+        self.docids = np.asarray(docids, dtype=np.int64)
+        self.doc_lens = np.asarray(doc_lens, dtype=np.int64)
+        self.matrix = csr_matrix((np.asarray(counts, dtype=np.int32), np.asarray(term_ids, dtype=np.int64),
+                                  np.asarray(indptr, dtype=np.int64)), shape=(len(self.docids), num_terms))
+        self.matrix.sort_indices()
+        self.columns = self.matrix.tocsc()
+        self.num_doc_terms = np.diff(self.matrix.indptr)
+        self.doc_freq = np.bincount(self.matrix.indices, minlength=num_terms)
+        self.coll_freq = np.bincount(self.matrix.indices, weights=self.matrix.data, minlength=num_terms)
+
+    @classmethod
+    def from_collection(cls, coll):
+        """Build the matrix of a collection of BOW documents."""
+        vocabulary = coll.get_vocabulary()
+        docs = coll.get_docs()
+        indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        term_ids = []
+        counts = []
+        docids = np.empty(len(docs), dtype=np.int64)
+        doc_lens = np.empty(len(docs), dtype=np.int64)
+        for row, (docid, doc) in enumerate(docs.items()):
+            term_id_freqs = doc.get_term_id_freqs(vocabulary)
+            for term_id, frequency in term_id_freqs:
+                term_ids.append(term_id)
+                counts.append(frequency)
+            indptr[row + 1] = indptr[row] + len(term_id_freqs)
+            docids[row] = docid
+            doc_lens[row] = doc.get_doc_len()
+        return cls(counts, term_ids, indptr, docids, doc_lens, len(vocabulary))
+
+    def get_matrix(self):
+        """Get the CSR matrix of term counts, with one row per document."""
+        return self.matrix
+
+    def get_docids(self):
+        """Get the array of docids, one per matrix row."""
+        return self.docids
+
+    def get_doc_lens(self):
+        """Get the array of document lengths, one per matrix row."""
+        return self.doc_lens
+
+    def get_num_docs(self):
+        """Get the number of documents (rows) in the matrix."""
+        return self.matrix.shape[0]
+
+    def get_num_terms(self):
+        """Get the number of terms (columns) in the matrix."""
+        return self.matrix.shape[1]
+
+    def get_columns(self, term_ids):
+        """Get the CSC sub-matrix of term counts for the given term ids.
+
+        Term ids outside the matrix, for terms added to the vocabulary after
+        the matrix was built, must be filtered out with query_arrays first."""
+        return self.columns[:, term_ids]
+
+    def query_arrays(self, term_ids):
+        """Split a term id:freq dictionary into id and freq arrays.
+
+        Terms without a column in the matrix are dropped.  Returns a
+        (term ids, frequencies) tuple of arrays in dictionary order."""
+        pairs = [(term_id, freq) for term_id, freq in term_ids.items() if term_id < self.matrix.shape[1]]
+        ids = np.array([term_id for term_id, _ in pairs], dtype=np.int64)
+        freqs = np.array([freq for _, freq in pairs], dtype=np.float64)
+        return ids, freqs
+
+    def to_score_dict(self, scores, mask=None):
+        """Pair an array of per-row scores with the docids.
+
+        Returns a dictionary with docids as keys and scores as values, in
+        row order.  If a boolean mask is given only the selected rows are
+        included."""
+        docids = self.docids
+        if mask is not None:
+            docids = docids[mask]
+            scores = scores[mask]
+        return dict(zip(docids.tolist(), scores.tolist()))
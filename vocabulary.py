@@ -0,0 +1,54 @@
+class Vocabulary:
+    """Mapping between terms and integer term ids.
+
+    Ids are assigned in order of first addition, starting from 0, and never
+    change afterwards, so a vocabulary can be shared by many documents."""
+
+    def __init__(self):
+        """Constructor.
+
+        Creates an empty vocabulary.  Call add_term to assign ids."""
+        self.term_ids = {}
+        self.terms = []
+
+    @classmethod
+    def from_terms(cls, terms):
+        """Create a vocabulary from a list of terms, ordered by id."""
+        vocabulary = cls()
+        vocabulary.terms = list(terms)
+        vocabulary.term_ids = {term: term_id for term_id, term in enumerate(vocabulary.terms)}
+        return vocabulary
+
+    def add_term(self, term):
+        """Get the id of a term, assigning a new id if the term is unknown."""
+        try:
+            return self.term_ids[term]
+        except KeyError:
+            term_id = len(self.terms)
+            self.term_ids[term] = term_id
+            self.terms.append(term)
+            return term_id
+
+    def get_term_id(self, term):
+        """Get the id of a term.
+
+        Will raise a KeyError if the term is not in the vocabulary."""
+        return self.term_ids[term]
+
+    def get_term(self, term_id):
+        """Get the term with the given id.
+
+        Will raise an IndexError if there is no term with that id."""
+        return self.terms[term_id]
+
+    def get_num_terms(self):
+        """Get the number of terms in the vocabulary."""
+        return len(self.terms)
+
+    def __contains__(self, term):
+        """Check whether a term has an id."""
+        return term in self.term_ids
+
+    def __len__(self):
+        """Get the number of terms in the vocabulary."""
+        return len(self.terms)